@@ -13,30 +13,77 @@
 # limitations under the License.
 
 
-import time
+import os
+from collections import Counter
 from os.path import dirname, join
+from threading import Lock, Thread, Timer, current_thread
 from datetime import datetime, timedelta
 from mycroft import MycroftSkill, intent_file_handler
-from mycroft.util.parse import extract_datetime, normalize, extract_duration
-from mycroft.util.parse import extract_number
-from mycroft.util.time import now_local
-from mycroft.util.format import nice_time, nice_date, nice_duration, join_list, nice_date_time
+from mycroft.util.time import now_local, default_timezone
 from mycroft.util.log import LOG
 from mycroft.util import play_wav
 from mycroft.messagebus.client import MessageBusClient
+from mycroft.messagebus.message import Message
+
+from .chime import ChimePlayer
+from .engine import EXPIRY, GRACE, ReminderEngine
+from .extraction import ExtractionCache, minute_of
+from .history import CANCELLED, REMINDED, RETENTION, HistoryArchive
+from .lingua import (extract_datetime, extract_duration, extract_number,
+                     join_list, warm_up)
+from .metrics import Metrics, instrument, timed_handler
+from .recurrence import Recurrence
+from .rendering import DateFormatter, paginate
+from .resources import LanguageResources
+from .search import NameIndex
+from .service import RemoteEngine, ServiceUnavailable
+from .store import ActiveReminders, Reminder, ReminderIndex
+from .storage import SettingsBackend, SQLiteBackend
+from .transfer import (READERS, batched, file_format, to_reminders, unique,
+                       write_ical, write_jsonl)
 
 REMINDER_PING = join(dirname(__file__), 'twoBeep.wav')
 
-MINUTES = 60  # seconds
+PRIME_DELAY = 1  # seconds after speech before pre notifications may be given
+NOTIFY_DELAY = 10  # seconds after a skill handler before checking them
+CATCH_UP_DELAY = 30  # seconds after startup before summing up missed ones
 
-DEFAULT_TIME = now_local().replace(hour=8, minute=0, second=0)
+# Defaults of the announcement batching settings
+BATCH_WINDOW = 0  # seconds, reminders due this much later join a batch
+BATCH_MAX_ITEMS = 3  # reminders read out by name per announcement
+LISTING_MAX_ITEMS = 5  # reminders read out per listing, default
 
-def deserialize(dt):
-    return datetime.strptime(dt, '%Y%d%m-%H%M%S-%z')
+# Name search scores (1.0 is an exact match)
+DUPLICATE_SCORE = 0.9  # names at least this similar count as duplicates
+MATCH_SCORE = 0.5  # minimum score of reminders offered for deletion
 
+METRICS_INTERVAL = 300  # seconds between skill.reminder.metrics messages
+LOG_SAMPLE = 20  # only every n-th firing is logged (at debug level)
 
-def serialize(dt):
-    return dt.strftime('%Y%d%m-%H%M%S-%z')
+IMPORT_BATCH = 500  # imported reminders committed per transaction
+
+# Storage backend methods writing to the store
+STORE_WRITES = ('save', 'save_many', 'delete', 'clear_timed',
+                'add_untimed', 'remove_untimed', 'clear_untimed')
+
+
+def default_time():
+    """ Time used when a date is given without a time (8 am). """
+    return now_local().replace(hour=8, minute=0, second=0, microsecond=0)
+
+
+def to_epoch(dt):
+    return int(dt.timestamp())
+
+
+def from_epoch(ts):
+    return datetime.fromtimestamp(ts, default_timezone())
+
+
+def start_of_day(d):
+    """ Epoch time of local midnight at the start of date d. """
+    return to_epoch(datetime(d.year, d.month, d.day,
+                             tzinfo=default_timezone()))
 
 
 def is_today(d):
@@ -51,8 +98,23 @@ class ReminderSkill(MycroftSkill):
         super(ReminderSkill, self).__init__()
         self.primed = False
 
-        self.cancelable = []  # list of reminders that can be cancelled
+        self.cancelable = ActiveReminders()  # announced reminders
         self.NIGHT_HOURS = [23, 0, 1, 2, 3, 4, 5, 6]
+        self.reminders = ReminderIndex()
+        self.untimed = []  # replaced, not changed, on updates
+        self.untimed_names = NameIndex()
+        self.untimed_lock = Lock()  # serializes the untimed updates
+        self.store = None
+        self.history = None  # archive of finished reminders, if kept
+        self.engine = None
+        self.scheduler = None  # None when the reminder service schedules
+        self.chimes = None
+        self.extraction_cache = ExtractionCache()
+        self.formatter = DateFormatter()
+        self._resources = None  # LanguageResources of the current language
+        self.deferred = {}  # pending bus callback timers by name
+        self.deferred_lock = Lock()
+        self.metrics = Metrics()
 
     def initialize(self):
         # Handlers for notifications after speak
@@ -61,178 +123,372 @@ class ReminderSkill(MycroftSkill):
             self.bus.on('speak', self.prime)
             self.bus.on('mycroft.skill.handler.complete', self.notify)
             self.bus.on('mycroft.skill.handler.start', self.reset)
-
-        # Reminder checker event
-        self.schedule_repeating_event(self.__check_reminder, datetime.now(),
-                                      0.5 * MINUTES, name='reminder')
+        self.add_event('skill.reminder.metrics.request', self.handle_metrics)
+        self.add_event('skill.reminder.import', self.handle_import)
+        self.add_event('skill.reminder.export', self.handle_export)
+
+        # Load the stored reminders once, entries in the old string
+        # format are migrated on the way
+        self.store = instrument(self.__open_store(), self.metrics,
+                                'store.', STORE_WRITES)
+        self.history = self.__open_history()
+        self.untimed = self.store.load_untimed()
+        for name in self.untimed:
+            self.untimed_names.add(name, name)
+
+        # Timed reminders are scheduled by the skill or, if configured, by
+        # the shared reminder service
+        with self.metrics.timer('startup.engine'):
+            self.engine = self.__start_engine()
+        self.reminders = self.engine.reminders
+        self.cancelable = self.engine.active
+        self.scheduler = self.engine.scheduler
+
+        # Decode the chimes up front so firing doesn't touch the disk
+        self.chimes = ChimePlayer(play_wav)
+        self.chimes.load(REMINDER_PING)
+        for r in self.reminders:
+            if r.chime:
+                self.chimes.load(r.chime)
+
+        self.on_settings_changed()
+        self.settings_change_callback = self.on_settings_changed
+        self.engine.start()
+
+        # Reminders that came due while the device was off
+        self.metrics.incr('startup.stale', len(self.engine.stale))
+        self.metrics.incr('startup.expired', len(self.engine.expired))
+        if self.engine.expired:
+            self.log.info('Dropped {} expired reminders: {}'.format(
+                len(self.engine.expired),
+                ', '.join(r.name for r in self.engine.expired)))
+        if self.engine.stale:
+            self.__defer('missed', CATCH_UP_DELAY, self.__announce_missed,
+                         self.engine.stale)
+
+        # Load the language data in the background instead of on the
+        # first request
+        Thread(target=self.__warm_up, daemon=True).start()
+
+    def __warm_up(self):
+        try:
+            warm_up(self.lang, now_local())
+            self.resources  # reads the language files
+        except Exception as e:
+            self.log.warning('Warm-up failed: {}'.format(e))
+
+    def on_settings_changed(self):
+        if self.scheduler is not None:
+            self.scheduler.window = self.settings.get('batch_window',
+                                                      BATCH_WINDOW)
+        self.cancel_scheduled_event('PublishMetrics')
+        interval = self.settings.get('metrics_interval', METRICS_INTERVAL)
+        if interval:
+            self.schedule_repeating_event(self.publish_metrics, None,
+                                          interval, name='PublishMetrics')
+
+    def __open_store(self):
+        """ Open the reminder backend selected by the 'storage' setting.
+
+            'sqlite' (default) keeps the reminders in a database in the
+            skill's file system, importing the lists found in the settings
+            on first start. 'settings' keeps them in the skill settings.
+        """
+        if self.settings.get('storage', 'sqlite') == 'settings':
+            return SettingsBackend(self.settings)
+        store = SQLiteBackend(join(self.file_system.path, 'reminders.db'))
+        if store.import_settings(self.settings):
+            self.log.info('Imported reminders from the skill settings')
+        return store
+
+    def __open_history(self):
+        """ Open the history archive unless the 'history_retention'
+            setting (days) is 0.
+        """
+        retention = self.settings.get('history_retention', RETENTION)
+        if retention <= 0:
+            return None
+        history = HistoryArchive(join(self.file_system.path, 'history'),
+                                 default_timezone, retention)
+        history.prune(to_epoch(now_local()))
+        return history
+
+    def __start_engine(self):
+        """ Connect to the reminder service if the 'reminder_service'
+            setting is on, otherwise (or if it doesn't answer) schedule the
+            reminders locally.
+        """
+        if self.settings.get('reminder_service', False):
+            try:
+                return RemoteEngine(self.bus, self.__announce_fired)
+            except ServiceUnavailable as e:
+                self.log.error('{}, scheduling reminders locally'.format(e))
+        proactive = self.settings.get('proactive_notifications', False)
+        return ReminderEngine(self.store, self.__check_reminder,
+                              default_timezone,
+                              grace=self.settings.get('catch_up_grace', GRACE),
+                              expiry=self.settings.get('catch_up_expiry',
+                                                       EXPIRY),
+                              on_notice=self.__notice_due if proactive
+                              else None,
+                              history=self.history)
 
     #def add_notification(self, identifier, note, expiry): # see #64
     #    self.notes[identifier] = (note, expiry)
 
+    @property
+    def resources(self):
+        """ The yes/no and recurrence phrases of the current language,
+            loaded again only when the language changes.
+        """
+        resources = self._resources
+        if resources is None or resources.lang != self.lang:
+            resources = LanguageResources(self.root_dir, self.lang)
+            self._resources = resources
+        return resources
+
     def is_affirmative(self, utterance):
-        #affirmatives = ['yes', 'sure', 'please do']
-        affirmatives = self.translate_list('Affirmatives')
-        for word in affirmatives:
-            if word in utterance:
-                return True
-        return False
+        return self.resources.is_affirmative(utterance)
+
+    def __defer(self, name, delay, handler, *args):
+        """ Run handler after delay seconds on a timer thread, replacing a
+            pending call with the same name. Keeps bus callbacks from
+            blocking.
+        """
+        timer = Timer(delay, self.__run_deferred, (name, handler) + args)
+        timer.daemon = True
+        with self.deferred_lock:
+            pending = self.deferred.pop(name, None)
+            if pending is not None:
+                pending.cancel()
+            self.deferred[name] = timer
+        timer.start()
+
+    def __run_deferred(self, name, handler, *args):
+        with self.deferred_lock:
+            # A newer call or a cancel replaced this timer in the meantime
+            if self.deferred.get(name) is not current_thread():
+                return
+            del self.deferred[name]
+        handler(*args)
+
+    def __cancel_deferred(self, name=None):
+        """ Cancel the pending call name or all pending calls. """
+        with self.deferred_lock:
+            names = list(self.deferred) if name is None else [name]
+            for n in names:
+                pending = self.deferred.pop(n, None)
+                if pending is not None:
+                    pending.cancel()
 
     def prime(self, message):
-        time.sleep(1)
+        self.__defer('prime', PRIME_DELAY, self.__set_primed)
+
+    def __set_primed(self):
         self.primed = True
 
     def reset(self, message):
+        self.__cancel_deferred('notify')
         self.primed = False
 
     def contains_datetime(self, utterance):
-        return extract_datetime(utterance, now_local(), self.lang) is not None
+        return self.parse_datetime(utterance) is not None
+
+    def parse_datetime(self, text, default_time=None):
+        """ extract_datetime relative to now.
+
+            Results are cached per text, language and minute so the turns of
+            a dialog parse each utterance once.
+        """
+        now = now_local()
+        key = ('datetime', text, self.lang, minute_of(now), default_time)
+        return self.extraction_cache.get(key, lambda: extract_datetime(
+            text, now, self.lang, default_time=default_time))
+
+    def parse_duration(self, text):
+        """ Cached extract_duration. """
+        key = ('duration', text, self.lang)
+        return self.extraction_cache.get(
+            key, lambda: extract_duration(text, self.lang))
 
     def notify(self, message):
-        time.sleep(10)
+        """ Check for pending pre notifications a while after a skill
+            handler completed. A new handler starting cancels the check.
+        """
+        self.__defer('notify', NOTIFY_DELAY, self.__notify, message)
+
+    def __notify(self, message):
         if self.name in message.data.get('name', ''):
             self.primed = False
             return
 
-        handled_reminders = []
-        now = now_local()
+        now = to_epoch(now_local())
         if self.primed:
-            for r in self.settings.get('timed_reminders', []):                     ### 'timed_reminders'
-                print('Checking {}'.format(r))
-                dt = deserialize(r[1])
-                notification = deserialize(r[2])
-                if now > notification and now < dt and \
-                        (r[0],r[1]) not in self.cancelable:
-                    self.speak_dialog('ByTheWay', data={'reminder': r[0]})   ### 'timed_reminders'
-                    #self.cancelable.append(r[0])
-                    self.cancelable.append((r[0],r[1]))
-
+            with self.metrics.timer('notify.duration'):
+                self.__give_pre_notifications(now)
             self.primed = False
 
-    ################ keine Behandlung für unspec, because timed
-    def __check_reminder(self, message):
-        """ Repeating event handler. Checking if a reminder time has been
-            reached and presents the reminder. """
-        now = now_local()
-        handled_reminders = []
-        for r in self.settings.get('timed_reminders', []):
-            self.log.info(r)
-            dt = deserialize(r[1])
-            if now > dt:
-                play_wav(REMINDER_PING)
-                self.speak_dialog('Reminding', data={'reminder': r[0]})   ### 'timed_reminders'
-                handled_reminders.append(r)
-            #if now > dt - timedelta(minutes=10):   # see #64
-                #self.add_notification(r[0], r[0], dt)
-        self.log.info("Check_reminder/handled: ")
-        self.log.info(handled_reminders)
-        self.remove_handled(handled_reminders)
+    def __notice_due(self):
+        """ Give pre notifications as soon as they are due, used if the
+            'proactive_notifications' setting is on.
+        """
+        with self.metrics.timer('notify.duration'):
+            self.__give_pre_notifications(to_epoch(now_local()))
+
+    def __give_pre_notifications(self, now):
+        pending = self.engine.pre_notifications(now)
+        self.metrics.incr('notify.scanned', len(pending))
+        for r in pending:
+            self.speak_dialog('ByTheWay', data={'reminder': r.name})
+            self.engine.activate(r.id)
+            self.metrics.incr('notify.given')
 
     ################ keine Behandlung für unspec, because timed
-    def remove_handled(self, handled_reminders):
-        """ The reminder is removed and rescheduled to repeat in 2 minutes.
+    def __check_reminder(self, due):
+        """ Scheduler callback. Presents the reminders whose time has
+            been reached.
+
+            Arguments:
+                due:    ids of the reminders that came due
+        """
+        with self.metrics.timer('tick.duration'):
+            now = to_epoch(now_local())
+            # Rescheduling the repeats is atomic, a concurrent cancel or
+            # snooze applies either before or after it
+            fired, repeating = self.engine.fire(due)
+            for r in fired:
+                self.metrics.observe('tick.lateness', max(now - r.due, 0))
+            self.metrics.incr('tick.count')
+            self.metrics.incr('tick.scanned', len(due))
+            self.__announce_fired(fired, repeating)
+
+    def __announce_fired(self, reminders, repeating):
+        """ Announce fired reminders whose repeats the engine or the
+            reminder service has already rescheduled.
+        """
+        self.__announce(reminders)
+        if repeating:
+            self.speak_dialog('ToCancelInstructions')
+
+    def __announce(self, reminders):
+        """ Play the chime and read out the reminders in one utterance. """
+        self.metrics.incr('tick.fired', len(reminders))
+        if not reminders:
+            return
+        chime = next((r.chime for r in reminders if r.chime), REMINDER_PING)
+        self.chimes.play(chime)
+        self.speak_dialog('Reminding', data={
+            'reminder': self.join_names(reminders)})
+        if self.metrics.sample('log.tick', LOG_SAMPLE):
+            self.log.debug('Reminding: {}'.format(
+                ', '.join(r.name for r in reminders)))
+
+    def __announce_missed(self, reminders):
+        """ Sum up the reminders missed while the device was off in one
+            utterance, they are not repeated.
+        """
+        self.chimes.play(REMINDER_PING)
+        self.speak_dialog('MissedReminders', data={
+            'reminder': self.join_names(reminders)})
 
-            It is also marked as "cancelable" allowing "cancel current
-            reminder" to remove it.
+    def join_names(self, reminders):
+        """ Join the reminder names to one phrase for a single utterance.
 
-            Repeats a maximum of 3 times.
+            Only the first 'batch_max_items' names are read out, the rest
+            is summed up ("and 4 more").
         """
-        for r in handled_reminders:
-            #r[2] carries the pre notification time [dt]
-            if type(r[2]) is int:
-                repeats = r[2] + 1
-            else:
-                repeats = 1
-            self.settings['timed_reminders'].remove(r)
-            # If the reminer hasn't been repeated 3 times reschedule it
-            if repeats < 3:
-                self.log.info("Announcement No.:" + str(repeats))
-                self.speak_dialog('ToCancelInstructions')
-                new_time = deserialize(r[1]) + timedelta(minutes=2)
-                new_time_serialized = serialize(new_time)
-                self.settings['timed_reminders'].append(
-                        (r[0], new_time_serialized, repeats))
-                # Make the reminder cancelable
-                for entry in self.cancelable:
-                    if (r[0] in entry[0]) and (r[1] in entry[1]):
-                        #remove bc it is deleted from cancelable (name/time indicator)
-                        self.cancelable.remove(entry)
-                        self.cancelable.append((r[0],new_time_serialized))
-                        break
-                else:
-                    self.cancelable.append((r[0],new_time_serialized))
-                self.log.info("cancelable list")
-                self.log.info(self.cancelable)
-            else:
-                # Do not schedule a repeat and remove the reminder from
-                # the list of cancelable reminders
-                self.cancelable = [c for c in self.cancelable if c[0] != r[0]]
-
-    def remove_by_name(self, name, time, reminder_list):
-        for r in self.settings.get(reminder_list, []):
-            if r[0] == name and r[1] == time:
-                break
-            else:
-                return False  # No matching reminders found
-        self.settings[reminder_list].remove(r)
-        self.log.info(self.settings.get(reminder_list, []))
-        return True  # Matching reminder was found and removed
-
-    def check_duplicates(self, name, reminder_list, time=None, remove=False):
-        duplicate_list = []
-        for r in self.settings.get(reminder_list, []):
-            self.log.info(r)
-            self.log.info(r[0])
-            self.log.info(name)
-            # search for identical timestamps
-            if time != None and (r[1] == time):
-                self.log.warning("Time")
-                break
-            # search for identical reminder in terms of name in
-            # timed reminder lists (see .cancelable) and untimed reminder lists
-            elif (r[0] == name and isinstance(r, list)) or (r == name and isinstance(r, str)):
-                self.log.warning("Text")
-                duplicate_list.append(r)
-        if len(duplicate_list) == 0:
-            self.log.warning("False")
-            return False, None  # No matching reminders found
-        self.log.warning("remove")
-        if remove:
-            self.settings[reminder_list].remove(r)
-        return True, duplicate_list  # Matching reminder were found (and removed if remove=true)
+        shown, more = paginate(reminders, self.settings.get(
+            'batch_max_items', BATCH_MAX_ITEMS))
+        return self.join_items([r.name for r in shown], more)
 
-    ################ keine Behandlung für unspec, because timed
-    def reschedule_by_name(self, name, time, new_time):
-        """ Reschedule the reminder by it's name
-            (and time ; to ensure more than one reminder "appointment" (or else)
-            processed correctly)
+    def join_items(self, items, more=0):
+        """ Join spoken items to one phrase, adding "and {more} more" for
+            items left out.
+        """
+        if more:
+            items = items + [self.translate('AndMore', {'count': more})]
+        return join_list(items, self.translate('and'), lang=self.lang)
 
-            Arguments:
-                name:       Name of reminder to reschedule.
-                time:       Time of reminder to reschedule.
-                new_time:   New time for the reminder.
+    def spoken_time(self, dt):
+        """ Spoken time of datetime dt in the current language. """
+        return self.formatter.time(dt, self.lang)
+
+    def spoken_date(self, d, now=None):
+        """ Spoken date of d in the current language, relative to now. """
+        return self.formatter.date(d, self.lang, now or now_local())
 
-            Returns (Bool): True if a reminder was found.
+    def remove_by_id(self, reminder_id):
+        """ Remove a timed reminder.
+
+            Returns (Bool): True if the reminder was found and removed.
         """
-        serialized = serialize(new_time)
-        for r in self.settings.get('timed_reminders', []):                 ### 'timed_reminders'
-            if r[0] == name and r[1] == time:
-                break
-        else:
-            return False  # No matching reminders found
-        self.settings['timed_reminders'].remove(r)
-        self.settings['timed_reminders'].append((r[0], serialized))
+        return self.engine.remove(reminder_id) is not None
+
+    def skip_occurrence(self, r, when):
+        """ Skip the occurrence of the repeating reminder r at when. """
+        self.engine.skip(r.id, when)
+
+    def remove_untimed(self, name):
+        """ Remove an untimed reminder.
+
+            Returns (Bool): True if the reminder was found and removed.
+        """
+        with self.untimed_lock:
+            if name not in self.untimed:
+                return False
+            untimed = list(self.untimed)
+            untimed.remove(name)
+            self.untimed = untimed
+            if name not in untimed:
+                self.untimed_names.remove(name)
+            self.store.remove_untimed(name)
+            self.__archive(CANCELLED, [name])
         return True
 
+    def __untimed_named(self, name):
+        with self.untimed_lock:
+            return self.untimed_names.named(name)
+
+    def __archive(self, event, reminders):
+        if self.history is not None:
+            self.history.record(event, reminders, to_epoch(now_local()))
+
+    def search_names(self, name, reminder_list, cutoff=MATCH_SCORE):
+        """ Rank the reminders in the timed or untimed list by name.
+
+            Returns: list of (score, match) tuples, best first. Matches are
+                     Reminder objects for timed and names for untimed
+                     reminders.
+        """
+        if reminder_list == 'timed_reminders':
+            return self.reminders.search(name, cutoff=cutoff)
+        with self.untimed_lock:
+            return self.untimed_names.search(name, cutoff=cutoff)
+
+    def check_duplicates(self, name, reminder_list):
+        """ Search for reminders named (almost) like name in the timed or
+            untimed list.
+
+            Returns (tuple): (True, list of matches) or (False, None)
+        """
+        duplicate_list = [match for _, match in
+                          self.search_names(name, reminder_list,
+                                            DUPLICATE_SCORE)]
+        if len(duplicate_list) == 0:
+            return False, None  # No matching reminders found
+        return True, duplicate_list
+
     def date_str(self, d):
         if is_today(d):
             return 'today'
         elif is_tomorrow(d):
             return 'tomorrow'
         else:
-            return nice_date(d.date(), self.lang, now_local())
+            return self.spoken_date(d)
 
     ################ keine Behandlung für unspec, because timed
     @intent_file_handler('ReminderAt.intent')
+    @timed_handler
     def add_new_reminder(self, msg=None):
         """ Handler for adding  a reminder with a name at a specific time. """
         reminder = msg.data.get('reminder', None)
@@ -244,9 +500,8 @@ class ReminderSkill(MycroftSkill):
         reminder = (' ' + reminder).replace(' our ', ' your ').strip()
         # time = msg.data.get('timedate', None) OR msg.data.get('date', None) ???
         utterance = msg.data['utterance']
-        reminder_time, rest = (extract_datetime(utterance, now_local(),
-                                                self.lang,
-                                                default_time=DEFAULT_TIME) or
+        reminder_time, rest = (self.parse_datetime(
+                                   utterance, default_time=default_time()) or
                                (None, None))
 
         if reminder_time.hour in self.NIGHT_HOURS:
@@ -259,8 +514,62 @@ class ReminderSkill(MycroftSkill):
         else:
             self.speak_dialog('NoDateTime')
 
+    def match_recurrence(self, utterance):
+        """ Find a phrase of the Recurrence.value resource in utterance.
+
+            A # in a phrase stands for the interval ("every # hours").
+
+            Returns (tuple): (keyword, interval, matched phrase) or None
+        """
+        utterance = utterance.lower()
+        for pattern, keyword in self.resources.recurrence:
+            match = pattern.search(utterance)
+            if match is None:
+                continue
+            interval = 1
+            if match.groups():
+                interval = extract_number(match.group(1), lang=self.lang)
+                if not interval:
+                    continue
+            return keyword, int(interval), match.group(0)
+        return None
+
+    @intent_file_handler('RecurringReminder.intent')
+    @timed_handler
+    def add_recurring_reminder(self, msg=None):
+        """ Handler for reminders repeating every day, weekday, week or
+            number of hours.
+
+            Only the rule and the next occurrence are stored.
+        """
+        utterance = msg.data['utterance']
+        recurrence = self.match_recurrence(utterance)
+        if recurrence is None:
+            self.speak_dialog('NoDateTime')
+            return
+        keyword, interval, phrase = recurrence
+        reminder = msg.data.get('reminder') or self.get_response('AboutWhat')
+        if not reminder:
+            return
+        reminder = (' ' + reminder).replace(' my ', ' your ').strip()
+        reminder = (' ' + reminder).replace(' our ', ' your ').strip()
+
+        # The time of day comes from the utterance, every n hours counts
+        # from now
+        now = now_local()
+        start, _ = (self.parse_datetime(utterance,
+                                        default_time=default_time()) or
+                    (None, None))
+        if start is None or keyword == 'hourly':
+            start = now if keyword == 'hourly' else default_time()
+        rule = Recurrence.from_keyword(keyword, to_epoch(start), interval)
+        due = rule.next_after(to_epoch(now), default_timezone())
+        self.__save_reminder_local(reminder, from_epoch(due), str(rule),
+                                   phrase)
+
 
     @intent_file_handler('Reminder.intent')
+    @timed_handler
     def add_unspecified_reminder(self, msg=None):
         """ Starts a dialog to add a reminder when no time was supplied
             for the reminder.
@@ -278,12 +587,12 @@ class ReminderSkill(MycroftSkill):
         #if self.ask_yesno('ParticularTime') == 'yes':
             # Check if a time was also in the response
             self.log.info(response)
-            dt, rest = (extract_datetime(response, now_local(), self.lang) or (None, None))
+            dt, rest = (self.parse_datetime(response) or (None, None))
             while dt == None:
             #dt, rest = extract_datetime(response) or (None, None)
                 response = self.get_response('SpecifyTime')
                 #utterance = msg.data['utterance']
-                dt, rest = (extract_datetime(response, now_local(), self.lang) or (None, None))
+                dt, rest = (self.parse_datetime(response) or (None, None))
             #msg.data['reminder'] = reminder
             #msg.data['utterance'] = nice_date_time(dt, self.lang, now_local())
             #msg.data['date'] = nice_date(dt, self.lang, now_local())
@@ -308,16 +617,25 @@ class ReminderSkill(MycroftSkill):
             LOG.debug('put into general reminders')
             self.__save_untimed_reminder(reminder)
 
-    def __save_reminder_local(self, reminder, reminder_time):
-        """ Speak verification and store the reminder. """
+    def __save_reminder_local(self, reminder, reminder_time, rule=None,
+                              recurrence=None):
+        """ Speak verification and store the reminder.
+
+            Repeating reminders pass their rule string and the recurrence
+            phrase to confirm.
+        """
         """ Merged dialog SavingReminder, SavingReminderTomorrow, SavingReminderDate
             in SavingReminderDate
             Apllied to vocab en-us, other langs must adapt"""
         # Choose dialog depending on the date
 
-        self.speak_dialog('SavingReminderDate',
-                          {'time': nice_time(reminder_time, self.lang, now_local()),
-                           'date': nice_date(reminder_time, self.lang, now_local())})
+        spoken = {'time': self.spoken_time(reminder_time),
+                  'date': self.spoken_date(reminder_time)}
+        if rule:
+            spoken['recurrence'] = recurrence
+            self.speak_dialog('SavingRecurringReminder', spoken)
+        else:
+            self.speak_dialog('SavingReminderDate', spoken)
 
         def val_prenote_minutes(string):
             num = extract_number(string, self.lang)
@@ -326,35 +644,44 @@ class ReminderSkill(MycroftSkill):
         #How many minutes before event should be notified
         if self.ask_yesno('PreNotify') == 'yes':
             response = self.get_response('PreNotify_Minutes', validator=val_prenote_minutes)
-            serialized_note = serialize(reminder_time - timedelta(minutes=int(response)))
+            note_time = reminder_time - timedelta(minutes=int(response))
         else:
-            serialized_note = serialize(reminder_time)
-
-        serialized_event = serialize(reminder_time)
+            note_time = reminder_time
 
         # Store reminder
-        if 'timed_reminders' in self.settings:
-            self.settings['timed_reminders'].append((reminder, serialized_event, serialized_note))   ### 'timed_reminders'
-        else:
-            self.settings['timed_reminders'] = [(reminder, serialized_event, serialized_note)]   ### erstelle Liste
+        self.engine.add(Reminder(reminder, to_epoch(reminder_time),
+                                 to_epoch(note_time), rule=rule))
 
 
     def __save_untimed_reminder(self, reminder):
-        if 'untimed_reminders' in self.settings:
-            self.settings['untimed_reminders'].append(reminder)
-        else:
-            self.settings['untimed_reminders'] = [reminder]
+        self.__save_untimed_reminders([reminder])
+
+    def __save_untimed_reminders(self, reminders):
+        """ Store untimed reminders in one transaction.
+
+            The untimed lock is always taken before the store's lock.
+        """
+        reminders = list(reminders)
+        with self.untimed_lock:
+            # Nothing changes in memory if the batch is rolled back
+            with self.store.transaction():
+                for name in reminders:
+                    self.store.add_untimed(name)
+            self.untimed = self.untimed + reminders
+            for name in reminders:
+                self.untimed_names.add(name, name)
 
 
     ################ keine Behandlung für unspec, because timed
     @intent_file_handler('UnspecifiedReminderAt.intent')
+    @timed_handler
     def add_unnamed_reminder_at(self, msg=None):
         """ Handles the case where a time was given but no reminder
             name was added.
         """
         utterance = msg.data['timedate']
-        reminder_time, _ = (extract_datetime(utterance, now_local(), self.lang,
-                                             default_time=DEFAULT_TIME) or
+        reminder_time, _ = (self.parse_datetime(
+                                utterance, default_time=default_time()) or
                             (None, None))
 
         response = self.get_response('AboutWhat')
@@ -363,30 +690,34 @@ class ReminderSkill(MycroftSkill):
 
     ################ keine Behandlung für unspec, because timed
     @intent_file_handler('DeleteReminderForDay.intent')
+    @timed_handler
     def remove_reminders_for_day(self, msg=None):
         """ Remove all reminders for the specified date. """
-        if 'date' in msg.data:
-            date, _ = extract_datetime(msg.data['date'], lang=self.lang)
-        else:
-            date, _ = extract_datetime(msg.data['utterance'], lang=self.lang)
+        text = msg.data.get('date') or msg.data['utterance']
+        date, _ = self.parse_datetime(text) or (None, None)
+        if date is None:
+            self.speak_dialog('NoDateTime')
+            return
 
-        date_str = self.date_str(date or now_local().date())
+        date_str = self.date_str(date)
+        occurrences = self.reminders_on_day(date)
         # If no reminders exists for the provided date return;
-        for r in self.settings['timed_reminders']:
-            if deserialize(r[1]).date() == date.date():
-                break
-        else:  # Let user know that no reminders were removed
+        if not occurrences:  # Let user know that no reminders were removed
             self.speak_dialog('NoRemindersForDate', {'date': date_str})
             return
 
         answer = self.ask_yesno('ConfirmRemoveDay', data={'date': date_str})
         if answer == 'yes':
-            if 'timed_reminders' in self.settings:
-                self.settings['timed_reminders'] = [
-                        r for r in self.settings['timed_reminders']
-                        if deserialize(r[1]).date() != date.date()]
+            # Repeating reminders only lose their occurrence on that day
+            with self.engine.transaction():
+                for when, r in occurrences:
+                    if r.rule:
+                        self.skip_occurrence(r, when)
+                    else:
+                        self.remove_by_id(r.id)
 
     @intent_file_handler('DeleteReminderPerName.intent')
+    @timed_handler
     def delete_reminder_by_name(self, message):
         reminder = message.data.get('reminder', None)
         self.log.info(reminder)
@@ -394,55 +725,113 @@ class ReminderSkill(MycroftSkill):
             search_list="timed_reminders"
         else:
             search_list="untimed_reminders"
-        dup_found, dup_list = self.check_duplicates(reminder, search_list)
-        if dup_found:
-            if len(dup_list) > 1:
+        matches = self.search_names(reminder, search_list)
+        if matches:
+            # Offer the best match, and its equally good alternatives
+            best = matches[0][0]
+            dup_list = [m for score, m in matches if score >= best - 0.01]
+            if best < 1.0:
+                found = (dup_list[0] if search_list == "untimed_reminders"
+                         else dup_list[0].name)
+                if self.ask_yesno('ConfirmRemoveReminder',
+                                  data={'reminder': found}) != 'yes':
+                    return
+            if search_list == "untimed_reminders":
+                self.remove_untimed(dup_list[0])
+            elif len(dup_list) > 1:
                 #voice out the reminder date of duplicates to be specific
+                now = now_local()
                 dt_list = []
                 for dup in dup_list:
-                    dt_list.append(nice_date(deserialize(dup[1]), self.lang, now_local()))
-                date_str = join_list(dt_list, self.translate("and", self.lang))
+                    dt_list.append(self.spoken_date(from_epoch(dup.due),
+                                                      now))
+                date_str = join_list(dt_list, self.translate('and'),
+                                     lang=self.lang)
                 response = self.get_response('RemoveReminder_MultipleEntries',
                                 data={'reminder': date_str})
-                for reminder in dt_list:
-                    if response in reminder[1]:
+                when, _ = (self.parse_datetime(response)
+                           if response else None) or (None, None)
+                for dup in dup_list:
+                    if when and from_epoch(dup.due).date() == when.date():
+                        self.remove_by_id(dup.id)
                         break
-                remove_by_name(reminder, search_list)
+                else:
+                    self.speak_dialog('NoActive')
             else:
-                remove_by_name(reminder, search_list)
+                self.remove_by_id(dup_list[0].id)
         else:
             self.speak_dialog('NoActive')
 
     ################ keine Behandlung für unspec, because timed
     @intent_file_handler('GetRemindersForDay.intent')
+    @timed_handler
     def get_reminders_for_day(self, msg=None):
         """ List all reminders for the specified date. """
-        if 'date' in msg.data:
-            date, _ = extract_datetime(msg.data['date'], lang=self.lang)
-        else:
-            date, _ = extract_datetime(msg.data['utterance'], lang=self.lang)
-
-        if 'timed_reminders' in self.settings:
-            reminders = [r for r in self.settings['timed_reminders']
-                         if deserialize(r[1]).date() == date.date()]
-            if len(reminders) > 0:
-                for r in reminders:
-                    reminder, dt = (r[0], deserialize(r[1]))
-                    self.speak(reminder + ' at ' + nice_time(dt))
-                return
+        text = msg.data.get('date') or msg.data['utterance']
+        date, _ = self.parse_datetime(text) or (None, None)
+        if date is None:
+            self.speak_dialog('NoDateTime')
+            return
+        occurrences = self.reminders_on_day(date)
+        if len(occurrences) > 0:
+            # One utterance for the whole day instead of one per reminder
+            shown, more = paginate(occurrences, self.settings.get(
+                'listing_max_items', LISTING_MAX_ITEMS))
+            items = [self.translate('ReminderAtTime', data={
+                'reminder': r.name,
+                'time': self.spoken_time(from_epoch(when))})
+                for when, r in shown]
+            self.speak_dialog('RemindersForDay', data={
+                'date': self.spoken_date(date),
+                'reminders': self.join_items(items, more)})
+            return
         self.speak_dialog('NoUpcoming')
 
+    def reminders_on_day(self, d):
+        """ Occurrences of timed reminders on the local date of d.
+
+            Returns: list of (epoch time, reminder) tuples in time order.
+        """
+        next_day = d + timedelta(days=1)
+        return self.reminders.occurrences(start_of_day(d),
+                                          start_of_day(next_day),
+                                          default_timezone())
+
+    @intent_file_handler('GetRemindersForWeek.intent')
+    @timed_handler
+    def get_reminders_for_week(self, msg=None):
+        """ List the reminders coming up until the end of this week. """
+        now = now_local()
+        week_end = now + timedelta(days=7 - now.weekday())
+        occurrences = self.reminders.occurrences(to_epoch(now),
+                                                 start_of_day(week_end),
+                                                 default_timezone())
+        if len(occurrences) > 0:
+            shown, more = paginate(occurrences, self.settings.get(
+                'listing_max_items', LISTING_MAX_ITEMS))
+            items = []
+            for when, r in shown:
+                dt = from_epoch(when)
+                items.append(self.translate('NextOtherDate', data={
+                    'time': self.spoken_time(dt),
+                    'date': self.spoken_date(dt, now),
+                    'reminder': r.name}))
+            self.speak_dialog('RemindersThisWeek', data={
+                'reminders': self.join_items(items, more)})
+        else:
+            self.speak_dialog('NoUpcoming')
+
     @intent_file_handler('GetNextReminders.intent')
+    @timed_handler
     def get_next_reminder(self, msg=None):
         """ Get the first upcoming reminder. """
-        if len(self.settings.get('timed_reminders', [])) > 0:
-            reminders = [(r[0], deserialize(r[1]))
-                         for r in self.settings['timed_reminders']]
-            next_reminder = sorted(reminders, key=lambda tup: tup[1])[0]
+        r = self.reminders.first()
+        if r is not None:
+            next_reminder = (r.name, from_epoch(r.due))
 
             self.speak_dialog('NextOtherDate',
-                              data={'time': nice_time(next_reminder[1], self.lang, now_local()),
-                                    'date': nice_date(next_reminder[1], self.lang, now_local()),
+                              data={'time': self.spoken_time(next_reminder[1]),
+                                    'date': self.spoken_date(next_reminder[1]),
                                     'reminder': next_reminder[0]})
             #if is_today(next_reminder[1]):
             #    self.speak_dialog('NextToday',
@@ -460,13 +849,49 @@ class ReminderSkill(MycroftSkill):
         else:
             self.speak_dialog('NoUpcoming')
 
+    @intent_file_handler('RemindedAbout.intent')
+    @timed_handler
+    def get_reminded_about(self, msg=None):
+        """ List the reminders given on a past day, from the history. """
+        text = msg.data.get('date') or msg.data['utterance']
+        date, _ = self.parse_datetime(text) or (None, None)
+        if date is None:
+            self.speak_dialog('NoDateTime')
+            return
+        names = self.reminded_on_day(date)
+        if names:
+            shown, more = paginate(names, self.settings.get(
+                'listing_max_items', LISTING_MAX_ITEMS))
+            self.speak_dialog('RemindedAbout', data={
+                'date': self.spoken_date(date),
+                'reminders': self.join_items(shown, more)})
+        else:
+            self.speak_dialog('NothingReminded',
+                              data={'date': self.spoken_date(date)})
+
+    def reminded_on_day(self, d):
+        """ Names of the reminders given on the local date of d, in the
+            order they were given. The history is streamed, only the names
+            are kept.
+        """
+        names = []
+        seen = set()
+        next_day = d + timedelta(days=1)
+        for entry in self.engine.archived(start_of_day(d),
+                                          start_of_day(next_day), REMINDED):
+            if entry.name not in seen:
+                seen.add(entry.name)
+                names.append(entry.name)
+        return names
+
     @intent_file_handler('GetUntimedReminder.intent')
+    @timed_handler
     def get_untimed_reminder(self, msg=None):
         untimed_reminder_list = []
         """ Get Untimed Reminder and speak them in one go"""
-        for reminder in (self.settings.get('untimed_reminders', [])):
+        for reminder in self.untimed:
             untimed_reminder_list.append(reminder)
-        reminder_str = join_list(untimed_reminder_list, self.translate("and", self.lang))
+        reminder_str = join_list(untimed_reminder_list, self.translate('and'))
         if reminder_str != '':
             self.speak_dialog('UntimedReminder', data={'reminder': reminder_str})
         else:
@@ -474,18 +899,13 @@ class ReminderSkill(MycroftSkill):
 
     def __cancel_active(self):
         """ Cancel all active reminders. """
-        remove_list = []
         ret = len(self.cancelable) > 0  # there were reminders to cancel
-        self.log.info(self.cancelable)
-        for c in self.cancelable:
-            if self.remove_by_name(c[0], c[1], "timed_reminders"):
-                remove_list.append(c)
-        for c in remove_list:
-            self.cancelable.remove(c)
-        self.log.info(self.cancelable)
+        self.log.debug('Cancelling {}'.format(self.cancelable))
+        self.engine.cancel_active()
         return ret
 
     @intent_file_handler('CancelActiveReminder.intent')
+    @timed_handler
     def cancel_active(self, message):
         """ Cancel a reminder that's been triggered (and is repeating every
             2 minutes. """
@@ -495,32 +915,32 @@ class ReminderSkill(MycroftSkill):
             self.speak_dialog('NoActive')
 
     @intent_file_handler('SnoozeReminder.intent')
+    @timed_handler
     def snooze_active(self, message):
         """ Snooze the triggered reminders with a delay of {delta} (default: 15 minutes). """
-        remove_list = []
         utterance = message.data['utterance']
-        delta, _ = extract_duration(utterance, self.lang) or (timedelta(minutes=15), None)
-        for c in self.cancelable:
-            if self.reschedule_by_name(c[0], c[1],
-                                       now_local() + delta):
-                #self.speak_dialog('RemindingInFifteen')
-                self.speak_dialog('RemindingInFifteen',
-                                  data={"time": nice_time(now_local() + delta , self.lang)})
-                self.log.warning(now_local()+delta)
-                remove_list.append(c)
-        for c in remove_list:
-            self.cancelable.remove(c)
+        delta, _ = self.parse_duration(utterance) or (timedelta(minutes=15), None)
+        new_time = now_local() + delta
+        snoozed = self.engine.snooze_active(to_epoch(new_time))
+        if snoozed:
+            #self.speak_dialog('RemindingInFifteen')
+            self.speak_dialog('RemindingInFifteen',
+                              data={"time": self.spoken_time(new_time)})
 
     @intent_file_handler('ClearReminders.intent')
+    @timed_handler
     def clear_all(self, message):
         """ Clear all reminders. """
         #### remove in favour of check_and_remove?
         if self.ask_yesno('ClearAll_WhichList') == 'yes':
-            # remove from cancelable list
-            self.__cancel_active()
-            self.settings['timed_reminders'] = []
+            # Also empties the list of cancelable reminders
+            self.engine.clear()
         else:
-            self.settings['untimed_reminders'] = []
+            with self.untimed_lock:
+                self.__archive(CANCELLED, self.untimed)
+                self.untimed = []
+                self.untimed_names.clear()
+                self.store.clear_untimed()
         self.speak_dialog('ClearedAll')
 
     def stop(self, message=None):
@@ -530,7 +950,132 @@ class ReminderSkill(MycroftSkill):
         else:
             return False
 
+    def import_reminders(self, path, fmt=None):
+        """ Import the reminders of an iCalendar or JSON Lines file.
+
+            The file is streamed; entries are normalized to the local
+            timezone, checked for duplicates and committed in batches.
+
+            Arguments:
+                path:   file to read
+                fmt:    'ics' or 'jsonl' (default: from the file extension)
+
+            Returns (dict): numbers of 'imported', 'untimed', 'duplicates',
+                            'past' and 'invalid' entries.
+        """
+        read = READERS[fmt or file_format(path)]
+        counts = Counter()
+        with open(path, encoding='utf-8') as f:
+            pairs = to_reminders(read(f), default_timezone(),
+                                 to_epoch(now_local()), default_time().time(),
+                                 counts)
+            for batch in batched(pairs, IMPORT_BATCH):
+                batch = list(unique(batch, self.reminders,
+                                    self.__untimed_named, counts))
+                timed = [r for _, r in batch if r is not None]
+                self.__save_untimed_reminders([name for name, r in batch
+                                               if r is None])
+                self.engine.add_many(timed)
+                counts['imported'] += len(timed)
+                counts['untimed'] += len(batch) - len(timed)
+        self.log.info('Imported reminders from {}: {}'.format(path,
+                                                              dict(counts)))
+        return dict(counts)
+
+    def export_reminders(self, path, fmt=None):
+        """ Write all reminders to an iCalendar or JSON Lines file.
+
+            The file is replaced once completely written.
+
+            Returns (dict): numbers of exported 'reminders' and 'untimed'.
+        """
+        fmt = fmt or file_format(path)
+        reminders = self.reminders.snapshot()
+        untimed = self.untimed
+        if fmt == 'ics':
+            lines = write_ical(reminders, untimed, default_timezone(),
+                               to_epoch(now_local()))
+        else:
+            lines = write_jsonl(reminders, untimed, default_timezone())
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8', newline='') as f:
+            f.writelines(lines)
+        os.replace(tmp, path)
+        return {'reminders': len(reminders), 'untimed': len(untimed)}
+
+    def handle_import(self, message):
+        """ skill.reminder.import, data: path and optional format. """
+        Thread(target=self.__transfer, args=(message, self.import_reminders),
+               daemon=True).start()
+
+    def handle_export(self, message):
+        """ skill.reminder.export, data: path and optional format. """
+        Thread(target=self.__transfer, args=(message, self.export_reminders),
+               daemon=True).start()
+
+    def __transfer(self, message, transfer):
+        """ Run an import or export and answer with its result. """
+        try:
+            result = transfer(message.data['path'], message.data.get('format'))
+        except (KeyError, OSError, ValueError) as e:
+            self.log.warning('Reminder transfer failed: {}'.format(e))
+            result = {'error': str(e)}
+        except Exception as e:
+            # Answer anyway, the sender waits for the response
+            self.log.exception('Reminder transfer failed')
+            result = {'error': repr(e)}
+        self.bus.emit(message.response(result))
+
+    def metrics_snapshot(self):
+        """ Returns (dict): the metrics plus the current sizes of the
+            reminder lists and the parse and format cache statistics.
+        """
+        snapshot = self.metrics.snapshot()
+        snapshot['gauges'] = {'reminders': len(self.reminders),
+                              'untimed': len(self.untimed),
+                              'active': len(self.cancelable),
+                              'scheduled': (len(self.scheduler)
+                                            if self.scheduler else 0)}
+        snapshot['parse_cache'] = self.extraction_cache.info()
+        snapshot['format_cache'] = self.formatter.info()
+        if self.history is not None:
+            snapshot['history'] = self.history.info()
+        return snapshot
+
+    def publish_metrics(self, message=None):
+        self.bus.emit(Message('skill.reminder.metrics',
+                              self.metrics_snapshot()))
+
+    def handle_metrics(self, message):
+        """ Answer a skill.reminder.metrics.request, e.g. sent from the
+            CLI, with the current metrics.
+        """
+        self.bus.emit(message.response(self.metrics_snapshot()))
+
+    @intent_file_handler('ReminderMetrics.intent')
+    @timed_handler
+    def get_metrics(self, message):
+        """ Debug intent, sums up the metrics and logs all of them. """
+        snapshot = self.metrics_snapshot()
+        self.log.info('Reminder metrics: {}'.format(snapshot))
+        tick = snapshot['histograms'].get('tick.duration', {})
+        cache = snapshot['parse_cache']
+        lookups = cache['hits'] + cache['misses']
+        self.speak_dialog('ReminderMetrics', data={
+            'reminders': snapshot['gauges']['reminders'],
+            'fired': snapshot['counters'].get('tick.fired', 0),
+            'tick': round((tick.get('p95') or 0) * 1000),
+            'hits': round(100 * cache['hits'] / lookups) if lookups else 0})
+
     def shutdown(self):
+        self.__cancel_deferred()
+        self.cancel_scheduled_event('PublishMetrics')
+        if self.engine is not None:
+            self.engine.shutdown()
+        if self.chimes is not None:
+            self.chimes.shutdown()
+        if self.store is not None:
+            self.store.close()
         if isinstance(self.bus, MessageBusClient):
             self.bus.remove('speak', self.prime)
             self.bus.remove('mycroft.skill.handler.complete', self.notify)
@@ -0,0 +1,150 @@
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import wave
+from queue import Queue
+from threading import Lock, Thread
+
+from mycroft.util.log import LOG
+
+try:
+    import alsaaudio
+except ImportError:
+    alsaaudio = None
+
+
+PERIOD_SIZE = 1024  # frames written to the sound card at a time
+
+
+class Chime:
+    """ A wav file decoded once and kept in memory as raw PCM.
+
+        Arguments:
+            path:   wav file to load
+    """
+    def __init__(self, path):
+        self.path = path
+        with wave.open(path, 'rb') as w:
+            self.channels = w.getnchannels()
+            self.sample_width = w.getsampwidth()
+            self.rate = w.getframerate()
+            self.frames = w.readframes(w.getnframes())
+
+    @property
+    def params(self):
+        """ The PCM parameters the chime is played with. """
+        return self.channels, self.sample_width, self.rate
+
+    @property
+    def frame_size(self):
+        return self.channels * self.sample_width
+
+
+def alsa_format(sample_width):
+    return {1: alsaaudio.PCM_FORMAT_U8,
+            2: alsaaudio.PCM_FORMAT_S16_LE,
+            3: alsaaudio.PCM_FORMAT_S24_3LE,
+            4: alsaaudio.PCM_FORMAT_S32_LE}[sample_width]
+
+
+class ChimePlayer:
+    """ Plays preloaded chimes from a dedicated player thread.
+
+        The PCM data is written straight to ALSA when pyalsaaudio is
+        installed, so playing a chime neither reads the file nor spawns a
+        player process. Otherwise, or if writing fails, the fallback
+        (Mycroft's play_wav) is called with the file path. The player
+        thread keeps one PCM device open until shutdown.
+
+        Arguments:
+            fallback:   function playing a wav file by path
+            device:     ALSA device name
+    """
+    def __init__(self, fallback, device='default'):
+        self.fallback = fallback
+        self.device = device
+        self._chimes = {}
+        self._lock = Lock()
+        self._queue = Queue()
+        self._thread = None
+
+    def load(self, path):
+        """ Decode path unless it is cached already.
+
+            Returns: the Chime, or None if the file can't be decoded.
+        """
+        with self._lock:
+            if path not in self._chimes:
+                try:
+                    self._chimes[path] = Chime(path)
+                except (OSError, EOFError, wave.Error) as e:
+                    LOG.warning('Could not load chime {}: {}'.format(path, e))
+                    self._chimes[path] = None
+            return self._chimes[path]
+
+    def play(self, path):
+        """ Queue the chime for path, loading it first if needed. """
+        chime = self.load(path)
+        if chime is None or alsaaudio is None:
+            self.fallback(path)
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._queue.put(chime)
+
+    def shutdown(self):
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread = None
+
+    def _run(self):
+        pcm, params = None, None
+        try:
+            while True:
+                chime = self._queue.get()
+                if chime is None:
+                    return
+                try:
+                    # The device stays open between chimes and is only
+                    # reopened when a chime has another format
+                    if params != chime.params:
+                        if pcm is not None:
+                            pcm.close()
+                            pcm = None
+                        pcm, params = self._open(chime), chime.params
+                    self._write(pcm, chime)
+                except Exception as e:
+                    LOG.warning('Chime playback failed ({}), '
+                                'using play_wav'.format(e))
+                    if pcm is not None:
+                        pcm.close()
+                    pcm, params = None, None
+                    self.fallback(chime.path)
+        finally:
+            if pcm is not None:
+                pcm.close()
+
+    def _open(self, chime):
+        return alsaaudio.PCM(alsaaudio.PCM_PLAYBACK, device=self.device,
+                             channels=chime.channels, rate=chime.rate,
+                             format=alsa_format(chime.sample_width),
+                             periodsize=PERIOD_SIZE)
+
+    def _write(self, pcm, chime):
+        step = PERIOD_SIZE * chime.frame_size
+        for start in range(0, len(chime.frames), step):
+            pcm.write(chime.frames[start:start + step])
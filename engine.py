@@ -0,0 +1,391 @@
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from contextlib import contextmanager
+from functools import wraps
+from threading import RLock
+
+from .history import CANCELLED, COMPLETED, EXPIRED, MISSED
+from .scheduler import ReminderScheduler
+from .store import ActiveReminders, ReminderIndex, ReminderView
+
+MINUTES = 60  # seconds
+HOURS = 60 * MINUTES
+
+REPEAT_DELAY = 2 * MINUTES  # between the announcements of a reminder
+ANNOUNCEMENTS = 3  # times a reminder is announced unless cancelled
+
+# Reminders overdue at startup by up to GRACE are announced as usual, up to
+# EXPIRY they are summed up once without repeats, older ones are dropped
+GRACE = 15 * MINUTES
+EXPIRY = 24 * HOURS
+
+NOTICE = 'notice'  # scheduler key of the next pre notification
+
+
+def _exclusive(method):
+    """ Run an engine method as the writer of the reminders. """
+    @wraps(method)
+    def call(self, *args, **kwargs):
+        with self.reminders.writing():
+            return method(self, *args, **kwargs)
+    return call
+
+
+class ReminderEngine:
+    """ The timed reminders with their schedule and storage.
+
+        Every change is applied to the in-memory index, the scheduler and
+        the store together. The skill runs an engine of its own, the
+        reminder service runs one shared by all devices.
+
+        The engine is the single writer of the reminders: every change,
+        including compound ones like fire(), runs under self.lock.
+        Other threads read through self.reminders, a ReminderView handing
+        out immutable snapshots without waiting for the writer, and
+        self.active, which is copied on write.
+
+        Arguments:
+            store:      ReminderBackend holding the timed reminders
+            callback:   called by the scheduler with the ids of reminders
+                        that came due
+            tz:         function returning the local timezone
+            clock:      function returning the current epoch time
+            grace:      seconds a reminder may be overdue at startup and
+                        still be announced as usual
+            expiry:     seconds after which overdue reminders are dropped
+                        without being announced
+            on_notice:  if given, called without arguments whenever a pre
+                        notification time is reached
+            history:    HistoryArchive receiving the finished, cancelled
+                        and expired reminders, or None
+    """
+    def __init__(self, store, callback, tz, clock=time.time, grace=GRACE,
+                 expiry=EXPIRY, on_notice=None, history=None):
+        self.store = store
+        self.history = history
+        self.tz = tz
+        self.clock = clock
+        self.listener = None  # called with ('save', reminder),
+        # ('delete', reminder id) or ('clear', None) after each change
+        self.lock = RLock()
+        self.index = ReminderIndex(store.load_timed())
+        self.reminders = ReminderView(self.index, self.lock)
+        self.active = ActiveReminders(self.index)
+        self.scheduler = ReminderScheduler(callback, clock)
+        self.on_notice = on_notice
+        self.notices = None  # scheduler of the proactive notices
+        self.stale = []  # copies of the stale reminders found at startup
+        self.expired = []  # copies of the expired ones
+        self._catch_up(clock(), grace, expiry)
+
+    @_exclusive
+    def start(self):
+        """ Schedule the reminders, the callbacks may run from now on. """
+        self.scheduler.schedule_many((r.id, r.due) for r in self.index)
+        if self.on_notice is not None:
+            # Start with the notices that came due before
+            self.notices = ReminderScheduler(self._noticed, self.clock)
+            self.notices.schedule(NOTICE, self.clock())
+
+    def _catch_up(self, now, grace, expiry):
+        """ Reconcile the reminders that came due while nothing was running.
+
+            Missed reminders (overdue by up to grace seconds) are left to
+            fire together on the first tick. Stale ones (up to expiry) and
+            expired ones finish their occurrence without repeats and are
+            collected in self.stale and self.expired for the owner to sum
+            up. Only the overdue reminders are visited and their changes
+            are committed in one transaction.
+        """
+        overdue = self.index.between(float('-inf'), now - grace)
+        if not overdue:
+            return
+        with self.store.transaction():
+            for r in overdue:
+                if r.due < now - expiry:
+                    self.expired.append(r.copy())
+                    self.finish(r.id, EXPIRED)
+                else:
+                    self.stale.append(r.copy())
+                    self.finish(r.id, MISSED)
+
+    def _changed(self, kind, value):
+        if kind == 'clear':
+            self.reminders.changed()
+        else:
+            self.reminders.changed([value.id if kind == 'save' else value])
+        if self.listener is not None:
+            self.listener(kind, value)
+        self._arm_notice()
+
+    @_exclusive
+    def _arm_notice(self):
+        """ Wake up at the next pre notification if proactive notices are
+            on.
+        """
+        if self.notices is None:
+            return
+        when = self.index.next_notice(self.clock())
+        if when is None:
+            self.notices.cancel(NOTICE)
+        else:
+            self.notices.schedule(NOTICE, when)
+
+    def _noticed(self, keys):
+        try:
+            self.on_notice()
+        finally:
+            self._arm_notice()
+
+    def _archive(self, event, reminders):
+        if self.history is not None:
+            self.history.record(event, reminders, int(self.clock()))
+
+    def archived(self, start, end, events=None):
+        """ Stream the history entries of events between the epoch times
+            start and end, nothing if there is no history.
+        """
+        if self.history is None:
+            return iter(())
+        return self.history.entries(start, end, events)
+
+    def _save(self, r):
+        self.store.save(r)
+        self._changed('save', r)
+
+    @contextmanager
+    def transaction(self):
+        """ Commit the changes made in the with block together, no other
+            thread changes the reminders meanwhile.
+        """
+        with self.reminders.writing(), self.store.transaction():
+            yield self
+
+    def due(self, reminder_ids):
+        """ The existing reminders among reminder_ids. """
+        found = (self.index.get(i) for i in reminder_ids)
+        return [r for r in found if r is not None]
+
+    @_exclusive
+    def fire(self, reminder_ids):
+        """ Look up the reminders that came due and handle() them in one
+            step, so no other thread can change them in between.
+
+            Returns (tuple): (list of copies of the fired reminders as they
+                             were due, True if any of them will repeat)
+        """
+        reminders = self.due(reminder_ids)
+        fired = [r.copy() for r in reminders]
+        return fired, self.handle(reminders)
+
+    @_exclusive
+    def pre_notifications(self, now):
+        """ Reminders in their pre notification window that weren't
+            announced yet.
+        """
+        return [r for r in self.index.notices(now)
+                if r.id not in self.active]
+
+    @_exclusive
+    def add(self, reminder):
+        self.index.add(reminder)
+        self.scheduler.schedule(reminder.id, reminder.due)
+        self._save(reminder)
+        return reminder
+
+    @_exclusive
+    def add_many(self, reminders):
+        """ Add several reminders, stored in one batch. """
+        reminders = list(reminders)
+        self.store.save_many(reminders)
+        for r in reminders:
+            self.index.add(r)
+            self._changed('save', r)
+        self.scheduler.schedule_many((r.id, r.due) for r in reminders)
+        return reminders
+
+    @_exclusive
+    def remove(self, reminder_id):
+        """ Remove a reminder (all occurrences of repeating ones), it is
+            archived as cancelled.
+
+            Returns: the removed reminder or None.
+        """
+        r = self.index.get(reminder_id)
+        if r is not None:
+            self._archive(CANCELLED, [r])
+        return self._remove(reminder_id)
+
+    def _remove(self, reminder_id):
+        r = self.index.remove(reminder_id)
+        if r is None:
+            return None
+        self.scheduler.cancel(reminder_id)
+        self.active.discard(reminder_id)
+        self.store.delete(reminder_id)
+        self._changed('delete', reminder_id)
+        return r
+
+    @_exclusive
+    def reschedule(self, reminder_id, due, keep_notice=True):
+        """ Move a reminder to epoch time due.
+
+            The reminder counts as new afterwards and is announced the full
+            number of times again. Its pre notification moves along unless
+            keep_notice is False or it was announced already.
+
+            Returns: the reminder or None.
+        """
+        r = self.index.get(reminder_id)
+        if r is None:
+            return None
+        lead = 0
+        if keep_notice and not r.repeats and r.id not in self.active:
+            lead = max(0, r.due - r.notify)
+        self.index.reschedule(r.id, due, int(due) - lead)
+        r.repeats = 0
+        self.active.discard(r.id)
+        self.scheduler.schedule(r.id, r.due)
+        self._save(r)
+        return r
+
+    @_exclusive
+    def activate(self, reminder_id):
+        """ Mark a reminder as announced, e.g. by a pre notification. """
+        r = self.index.get(reminder_id)
+        if r is not None:
+            self.active.add(r)
+            self._save(r)
+        return r
+
+    @_exclusive
+    def finish(self, reminder_id, event=COMPLETED):
+        """ Done with the current occurrence of a reminder, which is
+            archived as event.
+
+            Repeating reminders move on to their next occurrence, others
+            (and rules without further occurrences) are removed.
+
+            Returns: the reminder or None.
+        """
+        r = self.index.get(reminder_id)
+        if r is None:
+            return None
+        self._archive(event, [r])
+        if r.rule:
+            due = r.recurrence.next_after(max(int(self.clock()), r.due),
+                                          self.tz())
+            if due is not None:
+                self._advance(r, due)
+                return r
+        return self._remove(r.id)
+
+    def _advance(self, r, due):
+        """ Move a repeating reminder to its occurrence at due, keeping the
+            pre notification lead time.
+        """
+        rule = r.recurrence
+        occurrence = rule.next_after(r.notify - 1, self.tz())
+        lead = max(0, occurrence - r.notify) if occurrence else 0
+        r.rule = str(rule.prune(due))
+        r.repeats = 0
+        self.active.discard(r.id)
+        self.index.reschedule(r.id, due, due - lead)
+        self.scheduler.schedule(r.id, due)
+        self._save(r)
+
+    @_exclusive
+    def skip(self, reminder_id, when):
+        """ Skip the occurrence at epoch time when of a repeating reminder.
+        """
+        r = self.index.get(reminder_id)
+        if r is None:
+            return None
+        if when == r.due:
+            return self.finish(r.id, CANCELLED)
+        skipped = r.copy()
+        skipped.due = when
+        self._archive(CANCELLED, [skipped])
+        r.rule = str(r.recurrence.skip(when))
+        self._save(r)
+        return r
+
+    @_exclusive
+    def handle(self, reminders):
+        """ Update reminders that were just announced.
+
+            Each is rescheduled to repeat REPEAT_DELAY after its due time
+            (or after now, if it was announced late) and marked active,
+            allowing "cancel current reminder" to remove it. After
+            ANNOUNCEMENTS announcements the occurrence is finished.
+
+            Arguments:
+                reminders:  the reminders or copies of them, e.g. read
+                            from a snapshot
+
+            Returns (bool): True if any of the reminders will repeat.
+        """
+        repeating = False
+        now = int(self.clock())
+        with self.store.transaction():
+            for r in self.due([r.id for r in reminders]):
+                if r.repeats + 1 < ANNOUNCEMENTS:
+                    repeating = True
+                    r.repeats += 1
+                    self.index.reschedule(
+                        r.id, max(r.due, now) + REPEAT_DELAY)
+                    self.scheduler.schedule(r.id, r.due)
+                    self.active.add(r)
+                    self._save(r)
+                else:
+                    self.finish(r.id)
+        return repeating
+
+    @_exclusive
+    def cancel_active(self):
+        """ Finish the current occurrence of all active reminders.
+
+            Returns: list of the reminders that were active.
+        """
+        with self.store.transaction():
+            cancelled = self.active.clear()
+            for r in cancelled:
+                self.finish(r.id)
+        return cancelled
+
+    @_exclusive
+    def snooze_active(self, due):
+        """ Move all active reminders to epoch time due.
+
+            Returns: list of the snoozed reminders.
+        """
+        with self.store.transaction():
+            return [r for r in self.active
+                    if self.reschedule(r.id, due, keep_notice=False)]
+
+    @_exclusive
+    def clear(self):
+        self._archive(CANCELLED, list(self.index))
+        self.active.clear()
+        self.index.clear()
+        self.scheduler.clear()
+        self.store.clear_timed()
+        self._changed('clear', None)
+
+    def shutdown(self):
+        self.scheduler.shutdown()
+        if self.notices is not None:
+            self.notices.shutdown()
@@ -0,0 +1,68 @@
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import OrderedDict
+from threading import Lock
+
+
+def minute_of(dt):
+    """ dt truncated to the minute, used as part of cache keys. """
+    return dt.replace(second=0, microsecond=0)
+
+
+class ExtractionCache:
+    """ Bounded LRU cache for lingua franca extraction results.
+
+        Callers build the key, typically from the extractor name, the
+        text, the language and the reference time rounded to the minute,
+        so a dialog turn parses each text only once. Results are stored as
+        tuples and handed out as fresh lists, failed extractions (None)
+        are cached as well.
+
+        Arguments:
+            maxsize:    number of results to keep
+    """
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._results)
+
+    def get(self, key, extract):
+        """ Return the cached result for key or store extract()'s result. """
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                result = self._results[key]
+                return list(result) if result is not None else None
+            self.misses += 1
+        result = extract()
+        stored = tuple(result) if result is not None else None
+        with self._lock:
+            self._results[key] = stored
+            self._results.move_to_end(key)
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+        return list(stored) if stored is not None else None
+
+    def info(self):
+        """ Returns (dict): hit/miss counters and the current size. """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._results), 'maxsize': self.maxsize}
@@ -0,0 +1,203 @@
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Append-only archive of the reminders that left the live set.
+
+    Every finished occurrence, cancelled or expired reminder is written as
+    one JSON line to a file of the local day it happened on:
+
+        history/2026-10-16.jsonl        today, appended to
+        history/2026-10-15.jsonl.gz     earlier days, compressed once
+
+    Lines look like
+
+        {"event": "completed", "at": 1760601720, "name": "dentist",
+         "due": 1760601600, "rule": null}
+
+    "due" is null for untimed reminders. Days older than the retention are
+    deleted, and reading a time range only opens the files of its days and
+    streams them line by line.
+"""
+import gzip
+import json
+import os
+import shutil
+from datetime import datetime, timedelta
+from os.path import exists, getsize, join
+from threading import Lock
+
+# History events
+COMPLETED = 'completed'  # announced, then cancelled or done repeating
+MISSED = 'missed'  # came due while nothing was running, summed up later
+EXPIRED = 'expired'  # dropped without being announced
+CANCELLED = 'cancelled'  # deleted before it came due
+
+REMINDED = (COMPLETED, MISSED)  # events the user was reminded of
+
+RETENTION = 90  # days of history kept by default
+
+SUFFIX = '.jsonl'
+COMPRESSED = SUFFIX + '.gz'
+
+
+class HistoryEntry:
+    """ One archived reminder occurrence.
+
+        Arguments:
+            event:  one of the history events
+            at:     epoch time of the event
+            name:   what the reminder was about
+            due:    epoch time of the occurrence, None for untimed reminders
+            rule:   rule string of repeating reminders or None
+    """
+    __slots__ = ('event', 'at', 'name', 'due', 'rule')
+
+    def __init__(self, event, at, name, due=None, rule=None):
+        self.event = event
+        self.at = at
+        self.name = name
+        self.due = due
+        self.rule = rule
+
+    def __repr__(self):
+        return 'HistoryEntry({}, {}, {!r})'.format(self.event, self.at,
+                                                   self.name)
+
+    def to_json(self):
+        return {'event': self.event, 'at': self.at, 'name': self.name,
+                'due': self.due, 'rule': self.rule}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['event'], data['at'], data['name'], data.get('due'),
+                   data.get('rule'))
+
+
+def _read(path):
+    """ Yield the entries of a day file, skipping a torn last line. """
+    opener = gzip.open if path.endswith(COMPRESSED) else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield HistoryEntry.from_json(json.loads(line))
+            except (ValueError, KeyError, TypeError):
+                continue
+
+
+class HistoryArchive:
+    """ Day files of history entries in a directory.
+
+        Appends go to the plain file of the current day. When the day
+        changes, the files of earlier days are compressed and those older
+        than the retention are deleted, so the directory holds at most
+        retention + 1 files.
+
+        Arguments:
+            directory:  where the day files are kept, created if missing
+            tz:         function returning the local timezone
+            retention:  days of history to keep
+    """
+    def __init__(self, directory, tz, retention=RETENTION):
+        self.directory = directory
+        self.tz = tz
+        self.retention = retention
+        self._today = None
+        self._lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _day(self, at):
+        return datetime.fromtimestamp(at, self.tz()).date()
+
+    def _path(self, day, suffix=SUFFIX):
+        return join(self.directory, day.isoformat() + suffix)
+
+    def _days(self):
+        """ The days with a file in the archive, as (day, path) tuples. """
+        for filename in sorted(os.listdir(self.directory)):
+            for suffix in (COMPRESSED, SUFFIX):
+                if filename.endswith(suffix):
+                    try:
+                        day = datetime.strptime(filename[:-len(suffix)],
+                                                '%Y-%m-%d').date()
+                    except ValueError:
+                        break
+                    yield day, join(self.directory, filename)
+                    break
+
+    def record(self, event, reminders, at):
+        """ Append an event of several reminders (or untimed reminder
+            names) at epoch time at.
+        """
+        lines = []
+        for r in reminders:
+            if isinstance(r, str):
+                entry = HistoryEntry(event, at, r)
+            else:
+                entry = HistoryEntry(event, at, r.name, r.due, r.rule)
+            lines.append(json.dumps(entry.to_json()) + '\n')
+        if not lines:
+            return
+        day = self._day(at)
+        with self._lock:
+            if self._today is None or day > self._today:
+                self._today = day
+                self._roll_over(day)
+            with open(self._path(day), 'a', encoding='utf-8') as f:
+                f.writelines(lines)
+
+    def _roll_over(self, today):
+        """ Compress the files of the days before today and delete the ones
+            past the retention.
+        """
+        oldest = today - timedelta(days=self.retention)
+        for day, path in list(self._days()):
+            if day < oldest:
+                os.remove(path)
+            elif day < today and path.endswith(SUFFIX):
+                # Appended as another gzip member if the day was
+                # compressed before, readers see one stream
+                with open(path, 'rb') as src, \
+                        gzip.open(self._path(day, COMPRESSED), 'ab') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(path)
+
+    def prune(self, now):
+        """ Apply the retention, e.g. at startup or when it changed. """
+        with self._lock:
+            self._today = self._day(now)
+            self._roll_over(self._today)
+
+    def entries(self, start, end, events=None):
+        """ Stream the entries of events in the epoch time range
+            [start, end), oldest first. All events if events is None.
+        """
+        first, last = self._day(start), self._day(max(start, end - 1))
+        day = first
+        while day <= last:
+            for suffix in (COMPRESSED, SUFFIX):
+                path = self._path(day, suffix)
+                if not exists(path):
+                    continue
+                for entry in _read(path):
+                    if (start <= entry.at < end and
+                            (events is None or entry.event in events)):
+                        yield entry
+            day += timedelta(days=1)
+
+    def info(self):
+        """ Returns (dict): number of day files and their size in bytes. """
+        with self._lock:
+            paths = [path for _, path in self._days()]
+        return {'days': len(paths),
+                'bytes': sum(getsize(p) for p in paths if exists(p))}
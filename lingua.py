@@ -0,0 +1,39 @@
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Mycroft's parse and format helpers used by the skill.
+
+    mycroft-core imports mycroft.util.parse and mycroft.util.format before
+    it loads any skill, so they are imported directly. Lingua franca still
+    loads the data of a language on its first call; warm_up() makes those
+    calls in the background so the first request doesn't wait for them.
+"""
+from mycroft.util.format import join_list, nice_date, nice_time
+from mycroft.util.parse import (extract_datetime, extract_duration,
+                                extract_number)
+
+
+def warm_up(lang, now):
+    """ Load the lingua franca data for lang.
+
+        Arguments:
+            lang:   language code
+            now:    current local datetime
+    """
+    nice_time(now, lang)
+    nice_date(now, lang, now)
+    join_list(['1', '2'], ',', lang=lang)
+    extract_datetime('8', now, lang)
+    extract_duration('8', lang)
+    extract_number('8', lang=lang)
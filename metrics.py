@@ -0,0 +1,143 @@
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from threading import Lock
+
+
+# Upper bounds of the histogram buckets in seconds, 100 us to 10 minutes
+BUCKETS = tuple(m * 10 ** e for e in range(-4, 3) for m in (1, 2.5, 5)) + (
+    600,)
+
+
+class Histogram:
+    """ Bucketed distribution of observed values.
+
+        Keeps the count, sum, min and max exactly; percentiles are estimated
+        as the upper bound of the bucket they fall in.
+    """
+    def __init__(self, buckets=BUCKETS):
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is overflow
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        rank = p * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                bound = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {'count': self.count, 'sum': self.sum,
+                'min': self.min, 'max': self.max,
+                'mean': self.sum / self.count if self.count else None,
+                'p50': self.percentile(0.5), 'p95': self.percentile(0.95)}
+
+
+class Metrics:
+    """ Counters and histograms of the skill's hot paths.
+
+        Durations are observed in seconds. All methods are thread safe, the
+        scheduler, bus callbacks and intent handlers record from different
+        threads.
+    """
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.counters = {}
+        self.histograms = {}
+        self._samples = {}
+        self._lock = Lock()
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        with self._lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram()
+            self.histograms[name].observe(value)
+
+    @contextmanager
+    def timer(self, name):
+        """ Observe the duration of the with block as name. """
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.observe(name, self.clock() - start)
+
+    def timed(self, name, func):
+        """ Wrap func to observe the duration of each call as name. """
+        @wraps(func)
+        def call(*args, **kwargs):
+            with self.timer(name):
+                return func(*args, **kwargs)
+        return call
+
+    def sample(self, name, every):
+        """ True for every every-th call with name, starting with the first.
+
+            Used to thin out log output on hot paths.
+        """
+        with self._lock:
+            n = self._samples.get(name, 0)
+            self._samples[name] = n + 1
+        return n % every == 0
+
+    def snapshot(self):
+        """ Returns (dict): JSON serializable counters and histograms. """
+        with self._lock:
+            return {'counters': dict(self.counters),
+                    'histograms': {name: h.snapshot()
+                                   for name, h in self.histograms.items()}}
+
+
+def timed_handler(func):
+    """ Decorator timing a skill method as handler.<method name> in the
+        skill's metrics.
+    """
+    name = 'handler.' + func.__name__
+
+    @wraps(func)
+    def call(self, *args, **kwargs):
+        with self.metrics.timer(name):
+            return func(self, *args, **kwargs)
+    return call
+
+
+def instrument(obj, metrics, prefix, methods):
+    """ Time calls to the given methods of obj as prefix + method name. """
+    for name in methods:
+        setattr(obj, name, metrics.timed(prefix + name, getattr(obj, name)))
+    return obj
@@ -0,0 +1,190 @@
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Recurrence rules of repeating reminders.
+
+    A rule is stored as one compact RRULE-like string, e.g.
+
+        DTSTART=1700000000;FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR
+
+    Times are epoch seconds. Occurrences are computed on demand, daily and
+    weekly rules keep the wall clock time of DTSTART across DST changes.
+"""
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+FREQUENCIES = ('HOURLY', 'DAILY', 'WEEKLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+RULE_PARTS = ('DTSTART', 'FREQ', 'INTERVAL', 'BYDAY', 'UNTIL', 'EXDATE')
+
+HOUR = 3600  # seconds
+
+# Keywords used in the Recurrence.value resource files
+KEYWORDS = {
+    'hourly': ('HOURLY', ()),
+    'daily': ('DAILY', ()),
+    'weekly': ('WEEKLY', ()),
+    'weekdays': ('WEEKLY', ('MO', 'TU', 'WE', 'TH', 'FR')),
+    'weekends': ('WEEKLY', ('SA', 'SU')),
+}
+KEYWORDS.update({day.lower(): ('WEEKLY', (day,)) for day in WEEKDAYS})
+
+
+class Recurrence:
+    """ An immutable recurrence rule.
+
+        Arguments:
+            start:      epoch time of the first occurrence
+            freq:       'HOURLY', 'DAILY' or 'WEEKLY'
+            interval:   repeat every interval hours, days or weeks
+            byday:      weekdays ('MO'...'SU') of weekly rules
+                        (default: the weekday of start)
+            until:      epoch time after which there are no occurrences
+            exdates:    epoch times of skipped occurrences
+    """
+    __slots__ = ('start', 'freq', 'interval', 'byday', 'until', 'exdates')
+
+    def __init__(self, start, freq, interval=1, byday=(), until=None,
+                 exdates=()):
+        if freq not in FREQUENCIES:
+            raise ValueError('Unsupported frequency {!r}'.format(freq))
+        if int(interval) < 1:
+            raise ValueError('Interval must be positive')
+        unknown = set(byday) - set(WEEKDAYS)
+        if unknown:
+            raise ValueError('Unknown weekdays {}'.format(sorted(unknown)))
+        self.start = int(start)
+        self.freq = freq
+        self.interval = int(interval)
+        self.byday = tuple(sorted(set(byday), key=WEEKDAYS.index))
+        self.until = None if until is None else int(until)
+        self.exdates = frozenset(int(t) for t in exdates)
+
+    @classmethod
+    def from_keyword(cls, keyword, start, interval=1):
+        """ Create a rule from a Recurrence.value keyword like 'daily'. """
+        freq, byday = KEYWORDS[keyword]
+        return cls(start, freq, interval, byday)
+
+    @classmethod
+    def parse(cls, text):
+        """ Create a rule from its string representation. """
+        parts = dict(part.split('=', 1) for part in text.split(';') if part)
+        unknown = set(parts) - set(RULE_PARTS)
+        if unknown:
+            raise ValueError('Unsupported rule parts {}'.format(
+                sorted(unknown)))
+        if 'DTSTART' not in parts or 'FREQ' not in parts:
+            raise ValueError('Rules need DTSTART and FREQ: {!r}'.format(text))
+        return cls(parts['DTSTART'], parts['FREQ'],
+                   parts.get('INTERVAL', 1),
+                   _split(parts.get('BYDAY', '')),
+                   parts.get('UNTIL'),
+                   _split(parts.get('EXDATE', '')))
+
+    def __str__(self):
+        parts = ['DTSTART={}'.format(self.start), 'FREQ=' + self.freq]
+        if self.interval != 1:
+            parts.append('INTERVAL={}'.format(self.interval))
+        if self.byday:
+            parts.append('BYDAY=' + ','.join(self.byday))
+        if self.until is not None:
+            parts.append('UNTIL={}'.format(self.until))
+        if self.exdates:
+            parts.append('EXDATE=' + ','.join(str(t) for t in
+                                              sorted(self.exdates)))
+        return ';'.join(parts)
+
+    def __repr__(self):
+        return 'Recurrence({!r})'.format(str(self))
+
+    def __eq__(self, other):
+        return isinstance(other, Recurrence) and str(self) == str(other)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def _replace(self, **changes):
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return Recurrence(**fields)
+
+    def _candidates(self, after, tz):
+        """ Occurrences at or after epoch time after, ignoring exdates. """
+        if self.freq == 'HOURLY':
+            step = self.interval * HOUR
+            k = max(0, -(-(after - self.start) // step))
+            t = self.start + k * step
+            while True:
+                yield t
+                t += step
+
+        base = datetime.fromtimestamp(self.start, tz)
+        first = base.date()
+        day = datetime.fromtimestamp(max(after, self.start), tz).date()
+        if self.freq == 'DAILY':
+            n = (day - first).days // self.interval * self.interval
+            while True:
+                date = first + timedelta(days=n)
+                yield int(datetime.combine(date, base.timetz()).timestamp())
+                n += self.interval
+
+        weekdays = [WEEKDAYS.index(d) for d in self.byday] or [
+            first.weekday()]
+        monday = first - timedelta(days=first.weekday())
+        week = (day - monday).days // 7 // self.interval * self.interval
+        while True:
+            for weekday in weekdays:
+                date = monday + timedelta(days=7 * week + weekday)
+                if date >= first:
+                    yield int(datetime.combine(date,
+                                               base.timetz()).timestamp())
+            week += self.interval
+
+    def occurrences(self, start, end, tz):
+        """ Occurrences in [start, end) in ascending order.
+
+            Arguments:
+                start, end: epoch times
+                tz:         timezone the wall clock times refer to
+        """
+        for t in self._candidates(start, tz):
+            if t >= end or (self.until is not None and t > self.until):
+                return
+            if t >= start and t not in self.exdates:
+                yield t
+
+    def next_after(self, t, tz):
+        """ The first occurrence after epoch time t, or None. """
+        end = float('inf') if self.until is None else self.until + 1
+        return next(self.occurrences(t + 1, end, tz), None)
+
+    def skip(self, t):
+        """ Returns: a rule without the occurrence at epoch time t. """
+        return self._replace(exdates=self.exdates | {int(t)})
+
+    def prune(self, before):
+        """ Returns: a rule forgetting skipped occurrences before before. """
+        return self._replace(exdates={t for t in self.exdates if t >= before})
+
+
+def _split(value):
+    return [v for v in value.split(',') if v]
+
+
+@lru_cache(maxsize=256)
+def parse_rule(text):
+    """ Cached Recurrence.parse, rules are immutable. """
+    return Recurrence.parse(text)
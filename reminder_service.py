@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Start the shared reminder service with the Python of mycroft-core:
+
+        python reminder_service.py ~/.mycroft/reminders.db
+
+    The skill directory name isn't a valid package name, so the skill is
+    loaded by path.
+"""
+import importlib.util
+import sys
+from os.path import abspath, dirname, join
+
+SKILL_DIR = dirname(abspath(__file__))
+PACKAGE = 'reminder_skill'
+
+
+if __name__ == '__main__':
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE, join(SKILL_DIR, '__init__.py'),
+        submodule_search_locations=[SKILL_DIR])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE] = package
+    spec.loader.exec_module(package)
+    from reminder_skill.service import main
+    sys.exit(main())
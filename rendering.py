@@ -0,0 +1,78 @@
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+
+from .lingua import nice_date, nice_time
+
+
+def paginate(items, limit):
+    """ Split items into the first limit ones and the number left over. """
+    limit = max(int(limit), 1)
+    return list(items[:limit]), max(len(items) - limit, 0)
+
+
+class DateFormatter:
+    """ Bounded LRU cache of spoken times and dates.
+
+        The spoken time only depends on the hour, minute and language. The
+        spoken date also depends on the reference day ("today", "tomorrow"
+        and whether the year is said), so it is cached per language and
+        reference day.
+
+        Arguments:
+            maxsize:    number of texts to keep
+    """
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._texts = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._texts)
+
+    def _get(self, key, render):
+        with self._lock:
+            if key in self._texts:
+                self._texts.move_to_end(key)
+                self.hits += 1
+                return self._texts[key]
+            self.misses += 1
+        text = render()
+        with self._lock:
+            self._texts[key] = text
+            while len(self._texts) > self.maxsize:
+                self._texts.popitem(last=False)
+        return text
+
+    def time(self, dt, lang):
+        """ Cached nice_time(dt, lang). """
+        return self._get(('time', dt.hour, dt.minute, lang),
+                         lambda: nice_time(dt, lang))
+
+    def date(self, d, lang, now):
+        """ Cached nice_date(d, lang, now) for a date or datetime d. """
+        day = d.date() if isinstance(d, datetime) else d
+        return self._get(('date', day, lang, now.date()),
+                         lambda: nice_date(d, lang, now))
+
+    def info(self):
+        """ Returns (dict): hit/miss counters and the current size. """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._texts), 'maxsize': self.maxsize}
@@ -0,0 +1,101 @@
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Language data the skill matches utterances against, read once per
+    language.
+
+    LanguageResources reads the affirmative and negative phrases and the
+    recurrence phrases of one language when it is created. It never
+    changes afterwards, so it can be shared between threads and replaced
+    as a whole when the language changes. Dialogs are still rendered by
+    Mycroft's translate() and speak_dialog().
+"""
+import csv
+import re
+from os.path import exists, join
+
+
+def _lines(path):
+    """ The non-empty lines of a resource file, skipping # comments. """
+    if not exists(path):
+        return ()
+    with open(path, encoding='utf-8') as f:
+        return tuple(line.strip() for line in f
+                     if line.strip() and not line.startswith('#'))
+
+
+def _values(path):
+    """ The name,value rows of a .value file, like translate_namedvalues. """
+    if not exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        rows = csv.reader(line for line in f if not line.startswith('#'))
+        return {row[0]: row[1] for row in rows if len(row) == 2}
+
+
+class PhraseMatcher:
+    """ Finds any of several phrases as whole words in a text.
+
+        All phrases are compiled into one case insensitive regular
+        expression, longer phrases take precedence and whitespace between
+        words is matched loosely.
+    """
+    def __init__(self, phrases):
+        phrases = {' '.join(p.lower().split()) for p in phrases}
+        phrases.discard('')
+        self.phrases = tuple(sorted(phrases, key=len, reverse=True))
+        self._pattern = None
+        if self.phrases:
+            self._pattern = re.compile(r'(?<!\w)(?:{})(?!\w)'.format('|'.join(
+                r'\s+'.join(re.escape(word) for word in phrase.split())
+                for phrase in self.phrases)), re.IGNORECASE)
+
+    def search(self, text):
+        """ Returns: the first phrase found in text or None. """
+        if self._pattern is None or not text:
+            return None
+        match = self._pattern.search(text)
+        return ' '.join(match.group(0).lower().split()) if match else None
+
+
+class LanguageResources:
+    """ The phrases of a language used to interpret answers and requests.
+
+        Arguments:
+            root_dir:   skill directory
+            lang:       language code, e.g. 'en-us'
+    """
+    def __init__(self, root_dir, lang):
+        self.lang = lang
+        dialog_dir = join(root_dir, 'dialog', lang)
+        self.affirmatives = PhraseMatcher(
+            _lines(join(dialog_dir, 'Affirmatives.list')))
+        self.negatives = PhraseMatcher(
+            _lines(join(dialog_dir, 'Negatives.list')))
+        # Recurrence phrases, a # stands for the interval ("every # hours")
+        recurrence = _values(join(dialog_dir, 'Recurrence.value'))
+        self.recurrence = tuple(
+            (re.compile(r'\b{}\b'.format(r'(\w+)'.join(
+                re.escape(part) for part in phrase.split('#')))),
+             keyword.strip())
+            for phrase, keyword in sorted(recurrence.items(),
+                                          key=lambda item: len(item[0]),
+                                          reverse=True))
+
+    def is_affirmative(self, utterance):
+        """ True if utterance contains an affirmative phrase and no negative
+            one ("not sure" isn't a yes).
+        """
+        return (self.affirmatives.search(utterance) is not None and
+                self.negatives.search(utterance) is None)
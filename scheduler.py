@@ -0,0 +1,175 @@
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import heapq
+import itertools
+import time
+from threading import RLock, Timer, current_thread
+
+
+# Timers never sleep longer than this so wall clock jumps (NTP, suspend)
+# are picked up in reasonable time.
+MAX_SLEEP = 300  # seconds
+
+# Entries due within this margin are handed out together with the entry
+# that woke the timer.
+TOLERANCE = 0.05  # seconds
+
+
+class ReminderScheduler:
+    """ Priority queue of due times backed by a single timer.
+
+        Only the earliest entry has a timer armed. Adding, moving or
+        removing an entry is O(log n); removed entries are invalidated
+        in place and dropped lazily when they reach the head of the queue.
+
+        Entries due up to window seconds after the one that woke the timer
+        are handed out in the same batch.
+
+        Arguments:
+            callback:       called with a list of keys that came due.
+            clock:          function returning the current epoch time.
+            timer_factory:  threading.Timer compatible factory.
+    """
+    def __init__(self, callback, clock=time.time, timer_factory=Timer):
+        self.callback = callback
+        self.window = 0
+        self.clock = clock
+        self.timer_factory = timer_factory
+        self._heap = []
+        self._entries = {}
+        self._counter = itertools.count()
+        self._timer = None
+        self._armed_for = None
+        self._lock = RLock()
+        self._stopped = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def schedule(self, key, when):
+        """ Schedule key at epoch time when, replacing any earlier entry. """
+        with self._lock:
+            self._invalidate(key)
+            entry = [when, next(self._counter), key, True]
+            self._entries[key] = entry
+            heapq.heappush(self._heap, entry)
+            self._arm()
+
+    def schedule_many(self, entries):
+        """ Schedule (key, when) pairs at once, arming the timer once.
+
+            Runs in O(n) for the whole queue instead of O(log n) per entry.
+        """
+        with self._lock:
+            for key, when in entries:
+                self._invalidate(key)
+                entry = [when, next(self._counter), key, True]
+                self._entries[key] = entry
+                self._heap.append(entry)
+            heapq.heapify(self._heap)
+            self._arm()
+
+    def cancel(self, key):
+        """ Remove key from the queue.
+
+            Returns (Bool): True if the key was scheduled.
+        """
+        with self._lock:
+            found = self._invalidate(key)
+            if found:
+                self._arm()
+            return found
+
+    def clear(self):
+        """ Remove all entries and disarm the timer. """
+        with self._lock:
+            self._heap = []
+            self._entries = {}
+            self._arm()
+
+    def pop_due(self, now=None):
+        """ Remove and return all keys due at now (default: clock()). """
+        now = self.clock() if now is None else now
+        due = []
+        with self._lock:
+            self._drop_invalid()
+            while self._heap and self._heap[0][0] <= now + TOLERANCE:
+                _, _, key, _ = heapq.heappop(self._heap)
+                del self._entries[key]
+                due.append(key)
+                self._drop_invalid()
+        return due
+
+    def shutdown(self):
+        with self._lock:
+            self._stopped = True
+            self._disarm()
+
+    def _invalidate(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        entry[-1] = False
+        return True
+
+    def _drop_invalid(self):
+        while self._heap and not self._heap[0][-1]:
+            heapq.heappop(self._heap)
+
+    def _disarm(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = None
+        self._armed_for = None
+
+    def _arm(self):
+        """ Make sure the timer matches the head of the queue. """
+        self._drop_invalid()
+        if self._stopped or not self._heap:
+            self._disarm()
+            return
+        when = self._heap[0][0]
+        if self._timer is not None and self._armed_for == when:
+            return
+        self._disarm()
+        delay = min(max(when - self.clock(), 0), MAX_SLEEP)
+        self._timer = self.timer_factory(delay, self._fire)
+        self._timer.daemon = True
+        self._armed_for = when
+        self._timer.start()
+
+    def _fire(self):
+        with self._lock:
+            # A schedule() in the meantime replaced this timer, the new
+            # one is armed for the head of the queue
+            if self._timer is not current_thread():
+                return
+            self._timer = None
+            self._armed_for = None
+            if self._stopped:
+                return
+        now = self.clock()
+        due = self.pop_due(now)
+        if due and self.window:
+            due += self.pop_due(now + self.window)
+        try:
+            if due:
+                self.callback(due)
+        finally:
+            with self._lock:
+                self._arm()
@@ -0,0 +1,149 @@
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+from bisect import bisect_left, insort
+from difflib import SequenceMatcher
+
+
+TOKEN = re.compile(r'\w+')
+
+# Weights of a query token matching a name token
+EXACT = 1.0
+PREFIX = 0.8  # "zahnarzt" matches "zahnarzttermin"
+FUZZY = 0.7  # scaled by the similarity ratio, "zahnartz" ~ "zahnarzt"
+
+FUZZY_CUTOFF = 0.75  # minimum similarity ratio of fuzzy token matches
+
+
+def tokenize(name):
+    return tuple(TOKEN.findall(name.lower()))
+
+
+class NameIndex:
+    """ Inverted index from name tokens to the keys of the named items.
+
+        Candidates are collected from the postings of the query tokens, so
+        a search only looks at items sharing (a prefix of) a token with the
+        query instead of the whole list. Misspelled tokens are matched
+        against the vocabulary entries sharing their first two letters.
+    """
+    def __init__(self):
+        self._postings = {}  # token -> set of keys
+        self._tokens = {}  # key -> tokens of the name
+        self._vocabulary = []  # sorted tokens
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def __contains__(self, key):
+        return key in self._tokens
+
+    def add(self, key, name):
+        if key in self._tokens:
+            self.remove(key)
+        tokens = tokenize(name)
+        self._tokens[key] = tokens
+        for token in set(tokens):
+            if token not in self._postings:
+                self._postings[token] = set()
+                insort(self._vocabulary, token)
+            self._postings[token].add(key)
+
+    def remove(self, key):
+        tokens = self._tokens.pop(key, None)
+        if tokens is None:
+            return False
+        for token in set(tokens):
+            keys = self._postings[token]
+            keys.discard(key)
+            if not keys:
+                del self._postings[token]
+                del self._vocabulary[bisect_left(self._vocabulary, token)]
+        return True
+
+    def copy(self):
+        index = NameIndex()
+        index._postings = {token: set(keys)
+                           for token, keys in self._postings.items()}
+        index._tokens = dict(self._tokens)
+        index._vocabulary = list(self._vocabulary)
+        return index
+
+    def clear(self):
+        self._postings = {}
+        self._tokens = {}
+        self._vocabulary = []
+
+    def named(self, name):
+        """ Keys of the items whose name has the same tokens as name. """
+        tokens = tokenize(name)
+        postings = [self._postings.get(token) for token in set(tokens)]
+        if not postings or not all(postings):
+            return []
+        # Only the items having the rarest token can match
+        return [key for key in min(postings, key=len)
+                if self._tokens[key] == tokens]
+
+    def _with_prefix(self, prefix):
+        """ Vocabulary tokens starting with prefix. """
+        pos = bisect_left(self._vocabulary, prefix)
+        while (pos < len(self._vocabulary) and
+               self._vocabulary[pos].startswith(prefix)):
+            yield self._vocabulary[pos]
+            pos += 1
+
+    def _token_matches(self, token):
+        """ Vocabulary tokens similar to token with their weight. """
+        matches = {}
+        for candidate in self._with_prefix(token[:2]):
+            if candidate == token:
+                weight = EXACT
+            elif candidate.startswith(token):
+                weight = PREFIX
+            else:
+                ratio = SequenceMatcher(None, token, candidate).ratio()
+                weight = FUZZY * ratio if ratio >= FUZZY_CUTOFF else 0
+            if weight:
+                matches[candidate] = weight
+        return matches
+
+    def search(self, query, limit=5, cutoff=0.5):
+        """ Rank the indexed names against query.
+
+            A name scores 1.0 when all tokens match exactly. The score
+            weighs how much of the query was found (3/4) against how much
+            of the name was matched (1/4).
+
+            Returns: list of (score, key) tuples, best first.
+        """
+        query_tokens = set(tokenize(query))
+        if not query_tokens:
+            return []
+        found = {}  # key -> {query token: weight}
+        for q in query_tokens:
+            for token, weight in self._token_matches(q).items():
+                for key in self._postings[token]:
+                    best = found.setdefault(key, {})
+                    best[q] = max(best.get(q, 0), weight)
+        results = []
+        for key, weights in found.items():
+            matched = sum(weights.values())
+            precision = matched / len(query_tokens)
+            recall = matched / len(set(self._tokens[key]))
+            score = 0.75 * precision + 0.25 * min(recall, 1.0)
+            if score >= cutoff:
+                results.append((score, key))
+        results.sort(key=lambda r: -r[0])
+        return results[:limit]
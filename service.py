@@ -0,0 +1,433 @@
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Reminder service shared by the skills of several devices.
+
+    ReminderService runs a ReminderEngine next to the messagebus and
+    answers requests from the skills. Each skill uses a RemoteEngine, which
+    has the interface of ReminderEngine but sends changes to the service and
+    mirrors the reminders from its broadcasts, so lookups stay local.
+
+    Requests (answered with <type>.response, data 'error' on failure):
+
+        reminder.service.list       -> reminders, version
+        reminder.service.add        reminders -> ids
+        reminder.service.remove     ids -> removed
+        reminder.service.reschedule id, due, keep_notice -> found
+        reminder.service.activate   id -> found
+        reminder.service.finish     id -> found
+        reminder.service.skip       id, when -> found
+        reminder.service.cancel     -> cancelled
+        reminder.service.snooze     due -> snoozed
+        reminder.service.clear
+        reminder.service.history    start, end, events, limit -> entries
+
+    Broadcasts:
+
+        reminder.service.changed    version, saved, deleted, cleared
+        reminder.service.fire       reminders, repeating
+
+    Reminders are sent in their Reminder.to_json() form, times are epoch
+    seconds.
+"""
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import islice
+from os.path import abspath, dirname, join
+from threading import RLock, Thread
+
+from mycroft.messagebus.message import Message
+from mycroft.util.log import LOG
+
+from .engine import ReminderEngine
+from .history import RETENTION, HistoryEntry
+from .store import ActiveReminders, Reminder, ReminderIndex, ReminderView
+
+PREFIX = 'reminder.service.'
+CHANGED = PREFIX + 'changed'
+FIRE = PREFIX + 'fire'
+
+TIMEOUT = 3  # seconds to wait for an answer of the service
+HISTORY_LIMIT = 100  # history entries sent per answer, by default
+
+
+class ServiceUnavailable(Exception):
+    """ The reminder service didn't answer. """
+
+
+class ReminderService:
+    """ Serves a ReminderEngine over the messagebus.
+
+        Requests and the scheduler are serialized by a lock. The changes of
+        each request or firing are broadcast as one versioned
+        reminder.service.changed message before the answer is sent.
+
+        Arguments:
+            bus:    connected MessageBusClient
+            store:  ReminderBackend holding the reminders
+            tz:     function returning the local timezone
+            window: batch window of the scheduler in seconds
+            history: HistoryArchive of the shared reminders or None
+    """
+    def __init__(self, bus, store, tz, window=0, clock=time.time,
+                 history=None):
+        self.bus = bus
+        self.version = 0
+        self._lock = RLock()
+        self._changes = None
+        self.engine = ReminderEngine(store, self._fire, tz, clock,
+                                     history=history)
+        self.engine.scheduler.window = window
+        # No device may be listening yet to hear about missed reminders
+        for late, reminders in (('stale', self.engine.stale),
+                                ('expired', self.engine.expired)):
+            if reminders:
+                LOG.info('Finished {} {} reminders: {}'.format(
+                    len(reminders), late,
+                    ', '.join(r.name for r in reminders)))
+        self.engine.listener = self._record
+        self.requests = {
+            'list': self._list,
+            'add': self._add,
+            'remove': self._remove,
+            'reschedule': self._reschedule,
+            'activate': self._activate,
+            'finish': self._finish,
+            'skip': self._skip,
+            'cancel': self._cancel,
+            'snooze': self._snooze,
+            'clear': self._clear,
+            'history': self._history,
+        }
+        self._handlers = []
+        for name, request in self.requests.items():
+            handler = self._handler(request)
+            self._handlers.append((PREFIX + name, handler))
+            bus.on(PREFIX + name, handler)
+        self.engine.start()
+
+    def _handler(self, request):
+        def handle(message):
+            with self._changes_published():
+                try:
+                    result = request(message.data)
+                except (KeyError, TypeError, ValueError) as e:
+                    result = {'error': '{}: {}'.format(type(e).__name__, e)}
+            self.bus.emit(message.response(result))
+        return handle
+
+    @contextmanager
+    def _changes_published(self):
+        """ Collect the engine changes of the block and broadcast them. """
+        with self._lock:
+            self._changes = OrderedDict()
+            cleared = False
+            try:
+                yield
+            finally:
+                changes, self._changes = self._changes, None
+                cleared = changes.pop(None, False)
+                if changes or cleared:
+                    self._publish(changes, cleared)
+
+    def _record(self, kind, value):
+        if self._changes is None:  # change outside of a request
+            with self._changes_published():
+                self._record(kind, value)
+        elif kind == 'clear':
+            self._changes.clear()
+            self._changes[None] = True
+        elif kind == 'save':
+            self._changes.pop(value.id, None)
+            self._changes[value.id] = value.to_json()
+        else:
+            self._changes.pop(value, None)
+            self._changes[value] = None
+
+    def _publish(self, changes, cleared):
+        self.version += 1
+        self.bus.emit(Message(CHANGED, {
+            'version': self.version,
+            'cleared': cleared,
+            'saved': [e for e in changes.values() if e is not None],
+            'deleted': [i for i, e in changes.items() if e is None]}))
+
+    def _fire(self, reminder_ids):
+        """ Scheduler callback, handles the repeats and tells the devices to
+            announce the reminders.
+        """
+        with self._changes_published():
+            fired, repeating = self.engine.fire(reminder_ids)
+        if fired:
+            self.bus.emit(Message(FIRE, {
+                'reminders': [r.to_json() for r in fired],
+                'repeating': repeating}))
+
+    def _list(self, data):
+        return {'version': self.version,
+                'reminders': [r.to_json() for r in self.engine.reminders]}
+
+    def _add(self, data):
+        reminders = [Reminder.from_json(e) for e in data['reminders']]
+        with self.engine.transaction():
+            self.engine.add_many(reminders)
+        return {'ids': [r.id for r in reminders]}
+
+    def _remove(self, data):
+        with self.engine.transaction():
+            return {'removed': [i for i in data['ids']
+                                if self.engine.remove(i) is not None]}
+
+    def _reschedule(self, data):
+        return {'found': self.engine.reschedule(
+            data['id'], data['due'],
+            data.get('keep_notice', True)) is not None}
+
+    def _activate(self, data):
+        return {'found': self.engine.activate(data['id']) is not None}
+
+    def _finish(self, data):
+        return {'found': self.engine.finish(data['id']) is not None}
+
+    def _skip(self, data):
+        return {'found': self.engine.skip(data['id'],
+                                          data['when']) is not None}
+
+    def _cancel(self, data):
+        return {'cancelled': [r.id for r in self.engine.cancel_active()]}
+
+    def _snooze(self, data):
+        return {'snoozed': [r.id for r in
+                            self.engine.snooze_active(data['due'])]}
+
+    def _clear(self, data):
+        self.engine.clear()
+        return {}
+
+    def _history(self, data):
+        entries = self.engine.archived(data['start'], data['end'],
+                                       data.get('events'))
+        limit = data.get('limit', HISTORY_LIMIT)
+        return {'entries': [e.to_json() for e in islice(entries, limit)]}
+
+    def shutdown(self):
+        for msg_type, handler in self._handlers:
+            self.bus.remove(msg_type, handler)
+        self.engine.shutdown()
+
+
+class RemoteEngine:
+    """ ReminderEngine interface backed by the reminder service.
+
+        Changes are requests to the service. The reminders are mirrored
+        from the change broadcasts, a gap in their versions triggers a full
+        resync. The service fires the reminders and handles their repeats,
+        so there is no fire() or handle(); fired reminders are passed to
+        on_fire(reminders, repeating).
+
+        Raises ServiceUnavailable if the service doesn't answer.
+    """
+    scheduler = None  # the service schedules
+    stale = expired = ()  # and catches up after its downtime
+
+    def __init__(self, bus, on_fire, timeout=TIMEOUT):
+        self.bus = bus
+        self.on_fire = on_fire
+        self.timeout = timeout
+        self.version = None
+        self._lock = RLock()
+        self.index = ReminderIndex()
+        self.reminders = ReminderView(self.index, self._lock)
+        self.active = ActiveReminders()
+        bus.on(CHANGED, self._apply)
+        bus.on(FIRE, self._fired)
+        try:
+            self.sync()
+        except ServiceUnavailable:
+            self.shutdown()
+            raise
+
+    def start(self):
+        """ The service schedules the reminders. """
+
+    def _call(self, name, data=None):
+        reply = self.bus.wait_for_response(Message(PREFIX + name, data or {}),
+                                           timeout=self.timeout)
+        if reply is None:
+            raise ServiceUnavailable('The reminder service did not answer')
+        if 'error' in reply.data:
+            raise ValueError(reply.data['error'])
+        return reply.data
+
+    def sync(self):
+        """ Replace the mirrored reminders with the service's. """
+        data = self._call('list')
+        with self.reminders.writing():
+            self.index.clear()
+            self.reminders.changed()
+            self.active.clear()
+            for entry in data['reminders']:
+                self._put(Reminder.from_json(entry))
+            self.version = data['version']
+
+    def _put(self, r):
+        self.index.add(r)
+        self.reminders.changed([r.id])
+        if r.active:
+            self.active.add(r)
+        else:
+            self.active.discard(r.id)
+
+    def _apply(self, message):
+        data = message.data
+        with self.reminders.writing():
+            if self.version is None or data['version'] <= self.version:
+                return  # not synced yet or already applied
+            if data['version'] > self.version + 1:
+                # Missed a change, resync without blocking the bus
+                self.version = None
+                Thread(target=self.sync, daemon=True).start()
+                return
+            if data['cleared']:
+                self.index.clear()
+                self.reminders.changed()
+                self.active.clear()
+            for reminder_id in data['deleted']:
+                self.index.remove(reminder_id)
+                self.active.discard(reminder_id)
+            self.reminders.changed(data['deleted'])
+            for entry in data['saved']:
+                self._put(Reminder.from_json(entry))
+            self.version = data['version']
+
+    def _fired(self, message):
+        self.on_fire([Reminder.from_json(e)
+                      for e in message.data['reminders']],
+                     message.data['repeating'])
+
+    @contextmanager
+    def transaction(self):
+        """ Each request is applied on its own by the service. """
+        yield self
+
+    def due(self, reminder_ids):
+        found = (self.index.get(i) for i in reminder_ids)
+        return [r for r in found if r is not None]
+
+    def pre_notifications(self, now):
+        with self.reminders.writing():
+            return [r for r in self.index.notices(now)
+                    if r.id not in self.active]
+
+    def add(self, reminder):
+        self.add_many([reminder])
+        return reminder
+
+    def add_many(self, reminders):
+        reminders = list(reminders)
+        if reminders:
+            self._call('add', {'reminders': [r.to_json() for r in reminders]})
+        return reminders
+
+    def remove(self, reminder_id):
+        r = self.index.get(reminder_id)
+        removed = self._call('remove', {'ids': [reminder_id]})['removed']
+        return r if removed else None
+
+    def reschedule(self, reminder_id, due, keep_notice=True):
+        found = self._call('reschedule', {'id': reminder_id, 'due': due,
+                                          'keep_notice': keep_notice})
+        return self.index.get(reminder_id) if found['found'] else None
+
+    def activate(self, reminder_id):
+        found = self._call('activate', {'id': reminder_id})
+        return self.index.get(reminder_id) if found['found'] else None
+
+    def finish(self, reminder_id):
+        r = self.index.get(reminder_id)
+        return r if self._call('finish', {'id': reminder_id})['found'] \
+            else None
+
+    def skip(self, reminder_id, when):
+        r = self.index.get(reminder_id)
+        found = self._call('skip', {'id': reminder_id, 'when': when})
+        return r if found['found'] else None
+
+    def cancel_active(self):
+        active = {r.id: r for r in self.active}
+        cancelled = self._call('cancel')['cancelled']
+        return [active[i] for i in cancelled if i in active]
+
+    def snooze_active(self, due):
+        snoozed = self._call('snooze', {'due': due})['snoozed']
+        return [r for r in (self.index.get(i) for i in snoozed) if r]
+
+    def clear(self):
+        self._call('clear')
+
+    def archived(self, start, end, events=None, limit=HISTORY_LIMIT):
+        """ The first limit history entries of events between start and
+            end, as kept by the service.
+        """
+        data = self._call('history', {'start': start, 'end': end,
+                                      'events': events, 'limit': limit})
+        return [HistoryEntry.from_json(e) for e in data['entries']]
+
+    def shutdown(self):
+        self.bus.remove(CHANGED, self._apply)
+        self.bus.remove(FIRE, self._fired)
+
+
+def main(argv=None):
+    """ Run the reminder service until interrupted. """
+    import argparse
+    parser = argparse.ArgumentParser(description='Mycroft reminder service')
+    parser.add_argument('database', help='SQLite database of the reminders')
+    parser.add_argument('--batch-window', type=float, default=0,
+                        help='seconds within which reminders are announced '
+                             'together (default: 0)')
+    parser.add_argument('--history', metavar='DIR',
+                        help='directory of the history archive (default: '
+                             'reminder-history next to the database)')
+    parser.add_argument('--history-retention', type=int, default=RETENTION,
+                        metavar='DAYS',
+                        help='days of history to keep, 0 keeps none '
+                             '(default: {})'.format(RETENTION))
+    args = parser.parse_args(argv)
+
+    from mycroft.messagebus.client import MessageBusClient
+    from mycroft.util import wait_for_exit_signal
+    from mycroft.util.time import default_timezone
+    from .history import HistoryArchive
+    from .storage import SQLiteBackend
+
+    history = None
+    if args.history_retention > 0:
+        history = HistoryArchive(
+            args.history or join(dirname(abspath(args.database)),
+                                 'reminder-history'),
+            default_timezone, args.history_retention)
+        history.prune(time.time())
+    bus = MessageBusClient()
+    bus.run_in_thread()
+    store = SQLiteBackend(args.database)
+    service = ReminderService(bus, store, default_timezone,
+                              args.batch_window, history=history)
+    try:
+        wait_for_exit_signal()
+    finally:
+        service.shutdown()
+        store.close()
+        bus.close()
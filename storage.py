@@ -0,0 +1,314 @@
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sqlite3
+from contextlib import contextmanager
+from threading import RLock
+
+from .store import Reminder
+
+
+class ReminderBackend:
+    """ Persistent storage for timed and untimed reminders.
+
+        Backends only persist; lookups are served from the in-memory index
+        of the skill. All write methods change the given rows only. Several
+        writes can be grouped with transaction() so they are committed
+        together.
+    """
+    def load_timed(self):
+        """ Returns: list of stored Reminder objects. """
+        raise NotImplementedError
+
+    def load_untimed(self):
+        """ Returns: list of untimed reminder names in insertion order. """
+        raise NotImplementedError
+
+    def save(self, reminder):
+        """ Insert or update a timed reminder. """
+        raise NotImplementedError
+
+    def save_many(self, reminders):
+        """ Insert or update several timed reminders at once.
+
+            Implementations don't go through save(), the skill times both
+            methods and each write must be counted once.
+        """
+        raise NotImplementedError
+
+    def delete(self, reminder_id):
+        raise NotImplementedError
+
+    def clear_timed(self):
+        raise NotImplementedError
+
+    def add_untimed(self, name):
+        raise NotImplementedError
+
+    def remove_untimed(self, name):
+        """ Remove one untimed reminder called name. """
+        raise NotImplementedError
+
+    def clear_untimed(self):
+        raise NotImplementedError
+
+    @contextmanager
+    def transaction(self):
+        yield self
+
+    def close(self):
+        pass
+
+
+class SettingsBackend(ReminderBackend):
+    """ Stores the reminders as lists in the skill settings.
+
+        Every change rewrites the list in the settings, which are saved as a
+        whole by Mycroft. Inside a transaction the lists are written once,
+        when the outermost transaction ends. Kept for setups that want the
+        reminders in settings.json.
+    """
+    def __init__(self, settings):
+        self.settings = settings
+        self._lock = RLock()
+        self._depth = 0
+        self._dirty = set()
+        self._timed = {}
+        for entry in settings.get('timed_reminders', []):
+            r = Reminder.from_json(entry)
+            self._timed[r.id] = r.to_json()
+        self._untimed = list(settings.get('untimed_reminders', []))
+        self._write('timed_reminders')
+
+    def _write(self, key):
+        """ Write the list key to the settings, or mark it for writing at
+            the end of the running transaction.
+        """
+        if self._depth:
+            self._dirty.add(key)
+        elif key == 'timed_reminders':
+            self.settings[key] = list(self._timed.values())
+        else:
+            self.settings[key] = list(self._untimed)
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            self._depth += 1
+            try:
+                yield self
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    dirty, self._dirty = self._dirty, set()
+                    for key in dirty:
+                        self._write(key)
+
+    def load_timed(self):
+        return [Reminder.from_json(e) for e in self._timed.values()]
+
+    def load_untimed(self):
+        return list(self._untimed)
+
+    def save(self, reminder):
+        self._save_many((reminder,))
+
+    def save_many(self, reminders):
+        self._save_many(reminders)
+
+    def _save_many(self, reminders):
+        for r in reminders:
+            self._timed[r.id] = r.to_json()
+        self._write('timed_reminders')
+
+    def delete(self, reminder_id):
+        if self._timed.pop(reminder_id, None) is not None:
+            self._write('timed_reminders')
+
+    def clear_timed(self):
+        self._timed = {}
+        self._write('timed_reminders')
+
+    def add_untimed(self, name):
+        self._untimed.append(name)
+        self._write('untimed_reminders')
+
+    def remove_untimed(self, name):
+        if name in self._untimed:
+            self._untimed.remove(name)
+            self._write('untimed_reminders')
+
+    def clear_untimed(self):
+        self._untimed = []
+        self._write('untimed_reminders')
+
+
+# Columns added after the first release, created on existing databases
+ADDED_COLUMNS = (
+    ('chime', 'TEXT'),
+    ('active', 'INTEGER NOT NULL DEFAULT 0'),
+    ('rule', 'TEXT'),
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS timed (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    due INTEGER NOT NULL,
+    notify INTEGER NOT NULL,
+    repeats INTEGER NOT NULL DEFAULT 0,
+    chime TEXT,
+    active INTEGER NOT NULL DEFAULT 0,
+    rule TEXT
+);
+CREATE INDEX IF NOT EXISTS timed_due ON timed (due);
+CREATE INDEX IF NOT EXISTS timed_notify ON timed (notify);
+CREATE INDEX IF NOT EXISTS timed_name ON timed (name);
+CREATE TABLE IF NOT EXISTS untimed (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS untimed_name ON untimed (name);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class SQLiteBackend(ReminderBackend):
+    """ Stores the reminders in a local SQLite database in WAL mode.
+
+        Arguments:
+            path:   database file (':memory:' for a throwaway database)
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = RLock()
+        self._depth = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False,
+                                    isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self._upgrade()
+
+    def _upgrade(self):
+        """ Add columns missing in databases created by older versions. """
+        columns = [row[1] for row in
+                   self.conn.execute('PRAGMA table_info(timed)')]
+        for column, definition in ADDED_COLUMNS:
+            if column not in columns:
+                self.conn.execute('ALTER TABLE timed ADD COLUMN '
+                                  '{} {}'.format(column, definition))
+
+    @contextmanager
+    def transaction(self):
+        """ Group writes, the outermost transaction commits or rolls back. """
+        with self._lock:
+            if self._depth == 0:
+                self.conn.execute('BEGIN')
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.conn.execute('ROLLBACK')
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.execute('COMMIT')
+
+    def _execute(self, sql, params=()):
+        with self.transaction():
+            return self.conn.execute(sql, params)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def get_meta(self, key, default=None):
+        rows = self._query('SELECT value FROM meta WHERE key = ?', (key,))
+        return rows[0][0] if rows else default
+
+    def set_meta(self, key, value):
+        self._execute('INSERT OR REPLACE INTO meta (key, value) '
+                      'VALUES (?, ?)', (key, value))
+
+    def import_settings(self, settings):
+        """ Move reminders stored in the skill settings into the database.
+
+            Runs once; the lists are removed from the settings afterwards.
+
+            Returns (Bool): True if anything was imported.
+        """
+        if self.get_meta('settings_imported'):
+            return False
+        timed = settings.get('timed_reminders', [])
+        untimed = settings.get('untimed_reminders', [])
+        with self.transaction():
+            for entry in timed:
+                self.save(Reminder.from_json(entry))
+            for name in untimed:
+                self.add_untimed(name)
+            self.set_meta('settings_imported', '1')
+        settings.pop('timed_reminders', None)
+        settings.pop('untimed_reminders', None)
+        return bool(timed or untimed)
+
+    def load_timed(self):
+        rows = self._query('SELECT name, due, notify, repeats, id, chime, '
+                           'active, rule FROM timed ORDER BY due')
+        return [Reminder(*row) for row in rows]
+
+    def load_untimed(self):
+        rows = self._query('SELECT name FROM untimed ORDER BY id')
+        return [row[0] for row in rows]
+
+    def save(self, reminder):
+        self._save_many((reminder,))
+
+    def save_many(self, reminders):
+        self._save_many(reminders)
+
+    def _save_many(self, reminders):
+        # Shared by save and save_many, which the skill times separately
+        with self.transaction():
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO timed '
+                '(id, name, due, notify, repeats, chime, active, rule) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                ((r.id, r.name, r.due, r.notify, r.repeats, r.chime,
+                  int(r.active), r.rule) for r in reminders))
+
+    def delete(self, reminder_id):
+        self._execute('DELETE FROM timed WHERE id = ?', (reminder_id,))
+
+    def clear_timed(self):
+        self._execute('DELETE FROM timed')
+
+    def add_untimed(self, name):
+        self._execute('INSERT INTO untimed (name) VALUES (?)', (name,))
+
+    def remove_untimed(self, name):
+        self._execute('DELETE FROM untimed WHERE id = '
+                      '(SELECT MIN(id) FROM untimed WHERE name = ?)', (name,))
+
+    def clear_untimed(self):
+        self._execute('DELETE FROM untimed')
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,459 @@
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+from datetime import datetime
+from math import floor
+from threading import get_ident
+from uuid import uuid4
+
+from .recurrence import parse_rule
+from .search import NameIndex
+
+
+LEGACY_FORMAT = '%Y%d%m-%H%M%S-%z'
+
+
+def parse_legacy(dt):
+    """ Epoch time of a timestamp in the old day/month swapped format. """
+    return int(datetime.strptime(dt, LEGACY_FORMAT).timestamp())
+
+
+def new_id():
+    return uuid4().hex
+
+
+class Reminder:
+    """ A timed reminder.
+
+        Times are stored as epoch seconds so ordering and comparisons never
+        need to parse anything.
+
+        Arguments:
+            name:       what to remind about
+            due:        epoch time of the reminder
+            notify:     epoch time of the pre notification (default: due)
+            repeats:    number of times the reminder has been announced
+            id:         stable identifier (default: generated)
+            chime:      wav file played instead of the default chime
+            active:     True once announced, until cancelled or snoozed
+            rule:       recurrence rule string of repeating reminders, due
+                        is the next occurrence then
+    """
+    __slots__ = ('id', 'name', 'due', 'notify', 'repeats', 'chime', 'active',
+                 'rule')
+
+    def __init__(self, name, due, notify=None, repeats=0, id=None,
+                 chime=None, active=False, rule=None):
+        self.id = id or new_id()
+        self.name = name
+        self.due = int(due)
+        self.notify = self.due if notify is None else int(notify)
+        self.repeats = repeats
+        self.chime = chime
+        self.active = bool(active)
+        self.rule = rule or None
+
+    def __repr__(self):
+        return 'Reminder({!r}, {}, notify={}, repeats={}, id={!r})'.format(
+            self.name, self.due, self.notify, self.repeats, self.id)
+
+    def copy(self):
+        return Reminder(self.name, self.due, self.notify, self.repeats,
+                        self.id, self.chime, self.active, self.rule)
+
+    @property
+    def recurrence(self):
+        """ The parsed rule (a Recurrence) or None for one-off reminders. """
+        return parse_rule(self.rule) if self.rule else None
+
+    def to_json(self):
+        """ Compact list representation used in the skill settings.
+
+            Optional trailing fields are only written when set.
+        """
+        optional = [self.chime, 1 if self.active else 0, self.rule]
+        while optional and not optional[-1]:
+            optional.pop()
+        return [self.name, self.due, self.notify, self.repeats,
+                self.id] + optional
+
+    @classmethod
+    def from_json(cls, data):
+        """ Create a reminder from a stored entry.
+
+            Entries in the old (name, '%Y%d%m-%H%M%S-%z', note or repeats)
+            format are migrated transparently.
+        """
+        if isinstance(data[1], str):
+            due = parse_legacy(data[1])
+            notify, repeats = None, 0
+            if len(data) > 2:
+                if isinstance(data[2], int):
+                    repeats = data[2]
+                else:
+                    notify = parse_legacy(data[2])
+            return cls(data[0], due, notify, repeats)
+        return cls(*data)
+
+
+class ReminderIndex:
+    """ Timed reminders ordered by due time.
+
+        Keeps a sorted list of (due, id) pairs next to an id lookup table so
+        the earliest reminder and lookups by id are cheap. The names are
+        kept in an inverted index for searches.
+
+        Repeating reminders are held once, with their next occurrence as due
+        time. Their later occurrences are expanded on demand by
+        occurrences().
+
+        Pre notifications are queued by time as (notify, id) pairs, so
+        notices() only visits the reminders that are in their window.
+    """
+    def __init__(self, reminders=()):
+        self._by_id = {}
+        self._order = []
+        self._notices = []
+        self._recurring = {}
+        self.names = NameIndex()
+        for r in reminders:
+            self._by_id[r.id] = r
+            self.names.add(r.id, r.name)
+            if r.rule:
+                self._recurring[r.id] = r
+        self._order = sorted((r.due, r.id) for r in self._by_id.values())
+        self._notices = sorted((r.notify, r.id) for r in self._by_id.values()
+                               if r.notify < r.due)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __iter__(self):
+        """ Iterate over the reminders in due order. """
+        by_id = self._by_id
+        return iter([by_id[i] for _, i in self._order])
+
+    def __contains__(self, reminder_id):
+        return reminder_id in self._by_id
+
+    def get(self, reminder_id):
+        return self._by_id.get(reminder_id)
+
+    def first(self):
+        """ The reminder due next, or None if the index is empty. """
+        if not self._order:
+            return None
+        return self._by_id[self._order[0][1]]
+
+    def between(self, start, end):
+        """ Reminders due at or after start and before end (epoch times).
+
+            Runs in O(log n + k) for k results.
+        """
+        lo = bisect_left(self._order, (start,))
+        hi = bisect_left(self._order, (end,), lo)
+        by_id = self._by_id
+        return [by_id[i] for _, i in self._order[lo:hi]]
+
+    def upcoming(self, k, after=None):
+        """ The next k reminders due at or after epoch time after.
+
+            Runs in O(log n + k).
+        """
+        lo = 0 if after is None else bisect_left(self._order, (after,))
+        by_id = self._by_id
+        return [by_id[i] for _, i in self._order[lo:lo + k]]
+
+    def notices(self, now):
+        """ Reminders whose pre notification is due, notify <= now < due.
+
+            Queued notices of reminders that are due already are dropped on
+            the way, so this runs in O(log n + k) for the k reminders in
+            their pre notification window.
+        """
+        hi = bisect_left(self._notices, (floor(now) + 1,))
+        found = [entry for entry in self._notices[:hi]
+                 if now < self._by_id[entry[1]].due]
+        if len(found) < hi:
+            self._notices[:hi] = found
+        return [self._by_id[i] for _, i in found]
+
+    def next_notice(self, after):
+        """ Epoch time of the first pre notification after after, or None.
+        """
+        pos = bisect_left(self._notices, (floor(after) + 1,))
+        return self._notices[pos][0] if pos < len(self._notices) else None
+
+    def _queue_notice(self, r):
+        if r.notify < r.due:
+            insort(self._notices, (r.notify, r.id))
+
+    def _drop_notice(self, r):
+        pos = bisect_left(self._notices, (r.notify, r.id))
+        if pos < len(self._notices) and self._notices[pos] == (r.notify,
+                                                                r.id):
+            del self._notices[pos]
+
+    def occurrences(self, start, end, tz):
+        """ All occurrences in [start, end), including the later ones of
+            repeating reminders.
+
+            Arguments:
+                start, end: epoch times
+                tz:         timezone of the wall clock times in the rules
+
+            Returns: list of (epoch time, reminder) tuples in time order.
+        """
+        found = [(r.due, r) for r in self.between(start, end)]
+        for r in self._recurring.values():
+            found.extend((t, r) for t in
+                         r.recurrence.occurrences(max(start, r.due + 1),
+                                                  end, tz))
+        found.sort(key=lambda occurrence: occurrence[0])
+        return found
+
+    def add(self, reminder):
+        if reminder.id in self._by_id:
+            self.remove(reminder.id)
+        self._by_id[reminder.id] = reminder
+        insort(self._order, (reminder.due, reminder.id))
+        self._queue_notice(reminder)
+        self.names.add(reminder.id, reminder.name)
+        if reminder.rule:
+            self._recurring[reminder.id] = reminder
+        return reminder
+
+    def remove(self, reminder_id):
+        """ Remove a reminder by id.
+
+            Returns: the removed reminder or None.
+        """
+        reminder = self._by_id.pop(reminder_id, None)
+        if reminder is not None:
+            pos = bisect_left(self._order, (reminder.due, reminder.id))
+            del self._order[pos]
+            self._drop_notice(reminder)
+            self.names.remove(reminder_id)
+            self._recurring.pop(reminder_id, None)
+        return reminder
+
+    def reschedule(self, reminder_id, due, notify=None):
+        """ Move a reminder to a new due time and, if given, a new pre
+            notification time.
+
+            Returns: the reminder or None if it doesn't exist.
+        """
+        reminder = self._by_id.get(reminder_id)
+        if reminder is not None:
+            pos = bisect_left(self._order, (reminder.due, reminder.id))
+            del self._order[pos]
+            self._drop_notice(reminder)
+            reminder.due = int(due)
+            if notify is not None:
+                reminder.notify = int(notify)
+            insort(self._order, (reminder.due, reminder.id))
+            self._queue_notice(reminder)
+        return reminder
+
+    def clear(self):
+        self._by_id = {}
+        self._order = []
+        self._notices = []
+        self._recurring = {}
+        self.names.clear()
+
+    def copy(self, previous=None, changed=None):
+        """ An independent copy of the index with copies of the reminders.
+
+            The reminder copies of previous, an earlier copy, are reused for
+            the reminders whose ids are not in changed (None: all changed).
+        """
+        if previous is None or changed is None:
+            by_id = {i: r.copy() for i, r in self._by_id.items()}
+        else:
+            by_id = dict(previous._by_id)
+            for i in changed:
+                r = self._by_id.get(i)
+                if r is None:
+                    by_id.pop(i, None)
+                else:
+                    by_id[i] = r.copy()
+            if len(by_id) != len(self._by_id):  # a change wasn't reported
+                by_id = {i: r.copy() for i, r in self._by_id.items()}
+        index = ReminderIndex()
+        index._by_id = by_id
+        index._order = list(self._order)
+        index._notices = list(self._notices)
+        index._recurring = {i: by_id[i] for i in self._recurring}
+        index.names = self.names.copy()
+        return index
+
+    def search(self, name, limit=5, cutoff=0.5):
+        """ Reminders with names similar to name, best match first.
+
+            Returns: list of (score, reminder) tuples.
+        """
+        return [(score, self._by_id[i])
+                for score, i in self.names.search(name, limit, cutoff)]
+
+
+class ReminderView:
+    """ Read access to a ReminderIndex changed by another thread.
+
+        Readers get an immutable snapshot of the index: copies of the
+        reminders as they were between two changes. The writer changes the
+        index inside writing() and reports the changed reminders with
+        changed(). The next reader takes a new snapshot if the writer's
+        lock is free, reusing the copies of the unchanged reminders. While
+        a write is in progress readers keep the previous snapshot, so they
+        never wait for a write. The writer itself reads its own changes.
+
+        Arguments:
+            index:  the ReminderIndex
+            lock:   the lock held by the writer while changing it
+    """
+    def __init__(self, index, lock):
+        self._index = index
+        self._lock = lock
+        self._writer = None  # thread inside writing()
+        self._depth = 0
+        self._snapshot = None
+        self._changed = None  # ids changed since the snapshot, None: all
+
+    @contextmanager
+    def writing(self):
+        """ Hold the writer's lock while changing the index. """
+        with self._lock:
+            self._writer = get_ident()
+            self._depth += 1
+            try:
+                yield self._index
+            finally:
+                self._depth -= 1
+                if not self._depth:
+                    self._writer = None
+
+    def changed(self, reminder_ids=None):
+        """ Report changed reminders (all if reminder_ids is None), called
+            by the writer inside writing().
+        """
+        if reminder_ids is None:
+            self._changed = None
+        elif self._changed is not None:
+            self._changed.update(reminder_ids)
+
+    def _current(self):
+        """ The index to read, the latest snapshot for readers. """
+        if self._writer == get_ident():
+            return self._index
+        if self._changed is None or self._changed:
+            # Only the very first snapshot is worth waiting for
+            if self._lock.acquire(blocking=self._snapshot is None):
+                try:
+                    self._snapshot = self._index.copy(self._snapshot,
+                                                      self._changed)
+                    self._changed = set()
+                finally:
+                    self._lock.release()
+        return self._snapshot
+
+    def __len__(self):
+        return len(self._current())
+
+    def __iter__(self):
+        return iter(self._current())
+
+    def __contains__(self, reminder_id):
+        return reminder_id in self._current()
+
+    def get(self, reminder_id):
+        return self._current().get(reminder_id)
+
+    def first(self):
+        return self._current().first()
+
+    def between(self, start, end):
+        return self._current().between(start, end)
+
+    def upcoming(self, k, after=None):
+        return self._current().upcoming(k, after)
+
+    def occurrences(self, start, end, tz):
+        return self._current().occurrences(start, end, tz)
+
+    def next_notice(self, after):
+        return self._current().next_notice(after)
+
+    def search(self, name, limit=5, cutoff=0.5):
+        return self._current().search(name, limit, cutoff)
+
+    def snapshot(self):
+        """ Copies of all reminders in due order. """
+        return [r.copy() for r in self._current()]
+
+
+class ActiveReminders:
+    """ Announced reminders that can be cancelled or snoozed.
+
+        Keyed by reminder id so membership, adding and removing are O(1).
+        The active flag of each reminder is kept in sync, so the registry
+        can be rebuilt from the stored reminders after a restart.
+
+        Changes replace the (small) table instead of modifying it, so
+        iterating and len() are safe while another thread changes it.
+    """
+    def __init__(self, reminders=()):
+        self._active = {r.id: r for r in reminders if r.active}
+
+    def __len__(self):
+        return len(self._active)
+
+    def __contains__(self, reminder_id):
+        return reminder_id in self._active
+
+    def __iter__(self):
+        """ Iterate over a snapshot of the active reminders. """
+        return iter(list(self._active.values()))
+
+    def __repr__(self):
+        return 'ActiveReminders({})'.format(list(self._active))
+
+    def add(self, reminder):
+        reminder.active = True
+        active = dict(self._active)
+        active[reminder.id] = reminder
+        self._active = active
+
+    def discard(self, reminder_id):
+        """ Returns: the reminder if it was active, otherwise None. """
+        if reminder_id not in self._active:
+            return None
+        active = dict(self._active)
+        reminder = active.pop(reminder_id)
+        self._active = active
+        reminder.active = False
+        return reminder
+
+    def clear(self):
+        """ Deactivate all reminders.
+
+            Returns: list of the reminders that were active.
+        """
+        reminders = list(self._active.values())
+        for r in reminders:
+            r.active = False
+        self._active = {}
+        return reminders
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Matching yes/no answers.
+
+    Finds the affirmative and negative phrases of the English resources
+    in answers as whole words only. Exits with code 1 on the first
+    failure.
+
+        python test/benchmark/answer_matching.py
+"""
+import importlib
+import sys
+
+from harness import SKILL_DIR, check, load_skill_module
+
+
+def main():
+    module = load_skill_module()
+    resources = importlib.import_module(module.__name__ + '.resources')
+    english = resources.LanguageResources(SKILL_DIR, 'en-us')
+
+    check(english.is_affirmative('yes please') and
+          english.is_affirmative('Yes,  PLEASE do'),
+          'yes please is a yes')
+    check(not english.is_affirmative('yesterday') and
+          not english.is_affirmative('I am unsure'),
+          'phrases inside other words don\'t count')
+    check(not english.is_affirmative('not sure') and
+          not english.is_affirmative('yes, cancel it'),
+          'a negative phrase turns a yes into a no')
+    check(not english.is_affirmative('') and
+          not english.is_affirmative('maybe later'),
+          'answers without a phrase aren\'t a yes')
+
+    matcher = resources.PhraseMatcher(['please', 'please do', ' ', 'ok'])
+    check(matcher.search('Please\tdo it') == 'please do' and
+          matcher.search('okay') is None,
+          'longer phrases take precedence, whitespace matches loosely')
+    check(resources.PhraseMatcher([]).search('yes') is None,
+          'no phrases match nothing')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Synthetic load benchmarks for the reminder engine.
+
+    Runs the skill against the stubbed Mycroft in ./stubs with 100 to 100k
+    reminders and reports the latency of the hot operations and the memory
+    held per reminder.
+
+    Timings are also expressed in units of a fixed calibration workload, so
+    baselines recorded on one machine can be compared on another. The run
+    fails (exit code 1) when an operation gets slower than the baseline by
+    more than the tolerance factor.
+
+        python test/benchmark/bench_reminder.py
+        python test/benchmark/bench_reminder.py --sizes 100 1000 --repeat 20
+        python test/benchmark/bench_reminder.py --save-baseline
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from datetime import timedelta
+from os.path import exists, join
+
+from harness import (BENCH_DIR, close_skill, load_skill_module, make_skill,
+                     synthetic_reminders)
+
+from mycroft.messagebus.message import Message
+
+BASELINE = join(BENCH_DIR, 'baseline.json')
+SIZES = (100, 1000, 10000, 100000)
+
+# Differences below this are noise, whatever the ratio
+NOISE_FLOOR = 50e-6  # seconds
+
+
+def calibrate(rounds=5):
+    """ Seconds taken by a fixed pure Python workload (best of rounds). """
+    rnd = random.Random(0)
+    data = [rnd.random() for _ in range(20000)]
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        table = {}
+        for i, v in enumerate(sorted(data)):
+            table[i % 997] = table.get(i % 997, 0) + v
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+# Each operation gets the skill, the loaded reminders and a counter and
+# returns the function to time, so setup work stays out of the measurement.
+
+def op_check_reminder(skill, reminders, i):
+    r = reminders[i % len(reminders)]
+    return lambda: skill._ReminderSkill__check_reminder([r.id])
+
+
+def op_handle(skill, reminders, i):
+    r = reminders[(i * 7 + 3) % len(reminders)]
+    return lambda: skill.engine.handle([r])
+
+
+def op_get_next_reminder(skill, reminders, i):
+    return lambda: skill.get_next_reminder(Message('', {}))
+
+
+def op_check_duplicates(skill, reminders, i):
+    name = reminders[(i * 13) % len(reminders)].name
+    return lambda: skill.check_duplicates(name, 'timed_reminders')
+
+
+def op_snooze_active(skill, reminders, i):
+    r = reminders[(i * 17 + 5) % len(reminders)]
+    skill.cancelable.add(r)
+    message = Message('', {'utterance': 'remind me in 10 minutes'})
+    return lambda: skill.snooze_active(message)
+
+
+def op_reminders_on_day(skill, reminders, i):
+    module = load_skill_module()
+    day = module.now_local() + timedelta(days=i % 365)
+    return lambda: skill.reminders_on_day(day)
+
+
+def op_add_reminder(skill, reminders, i):
+    module = load_skill_module()
+    when = module.now_local() + timedelta(days=1 + i % 300, minutes=i)
+    skill.responses.append('no')  # no pre notification
+    return lambda: skill._ReminderSkill__save_reminder_local(
+        'benchmark {}'.format(i), when)
+
+
+def op_pre_notifications(skill, reminders, i):
+    module = load_skill_module()
+    now = int(module.now_local().timestamp())
+    return lambda: skill._ReminderSkill__give_pre_notifications(now)
+
+
+OPERATIONS = (
+    ('check_reminder', op_check_reminder),
+    ('handle', op_handle),
+    ('get_next_reminder', op_get_next_reminder),
+    ('check_duplicates', op_check_duplicates),
+    ('snooze_active', op_snooze_active),
+    ('reminders_on_day', op_reminders_on_day),
+    ('add_reminder', op_add_reminder),
+    ('pre_notifications', op_pre_notifications),
+)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+def measure_memory(reminders, storage):
+    """ Bytes allocated per reminder by loading the skill. """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    skill = make_skill(reminders, storage)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    close_skill(skill)
+    return (after - before) / max(len(reminders), 1)
+
+
+def run_size(n, repeat, storage):
+    module = load_skill_module()
+    reminders = synthetic_reminders(n, int(module.now_local().timestamp()))
+    results = {}
+
+    start = time.perf_counter()
+    skill = make_skill(reminders, storage)
+    results['load'] = {'median': time.perf_counter() - start}
+    try:
+        loaded = list(skill.reminders)
+        for name, op in OPERATIONS:
+            timings = []
+            for i in range(repeat):
+                func = op(skill, loaded, i)
+                t = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - t)
+            results[name] = {'median': percentile(timings, 0.5),
+                             'p95': percentile(timings, 0.95)}
+    finally:
+        close_skill(skill)
+
+    # Startup after downtime, a tenth of the reminders came due meanwhile
+    late = synthetic_reminders(n, int(module.now_local().timestamp()),
+                               overdue=0.1)
+    start = time.perf_counter()
+    skill = make_skill(late, storage)
+    results['load_overdue'] = {'median': time.perf_counter() - start}
+    close_skill(skill)
+
+    results['memory_per_reminder'] = measure_memory(reminders, storage)
+    return results
+
+
+def compare(report, baseline, tolerance, memory_tolerance):
+    """ Returns: list of regression descriptions. """
+    regressions = []
+    scale = report['calibration'] / baseline['calibration']
+    for size, ops in report['results'].items():
+        base_ops = baseline['results'].get(size, {})
+        for name, stats in ops.items():
+            if name not in base_ops:
+                continue
+            if name == 'memory_per_reminder':
+                limit = base_ops[name] * memory_tolerance
+                if stats > limit:
+                    regressions.append('{} @ {}: {:.0f} B/reminder > {:.0f}'
+                                       .format(name, size, stats, limit))
+                continue
+            expected = base_ops[name]['median'] * scale
+            current = stats['median']
+            if (current > expected * tolerance and
+                    current - expected > NOISE_FLOOR):
+                regressions.append('{} @ {}: {:.1f} us > {:.1f} us x {}'
+                                   .format(name, size, current * 1e6,
+                                           expected * 1e6, tolerance))
+    return regressions
+
+
+def print_report(report, out):
+    out.write('calibration: {:.2f} ms\n'.format(report['calibration'] * 1e3))
+    for size, ops in report['results'].items():
+        out.write('\n{} reminders\n'.format(size))
+        for name, stats in ops.items():
+            if name == 'memory_per_reminder':
+                out.write('  {:<20} {:>10.0f} B\n'.format(name, stats))
+            elif 'p95' in stats:
+                out.write('  {:<20} {:>10.1f} us  (p95 {:.1f} us)\n'.format(
+                    name, stats['median'] * 1e6, stats['p95'] * 1e6))
+            else:
+                out.write('  {:<20} {:>10.1f} ms\n'.format(
+                    name, stats['median'] * 1e3))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--repeat', type=int, default=50,
+                        help='runs per operation (default: 50)')
+    parser.add_argument('--storage', choices=('sqlite', 'settings'),
+                        default='sqlite')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=2.0,
+                        help='allowed slowdown factor (default: 2.0)')
+    parser.add_argument('--memory-tolerance', type=float, default=1.5,
+                        help='allowed memory growth factor (default: 1.5)')
+    args = parser.parse_args(argv)
+
+    report = {'calibration': calibrate(), 'storage': args.storage,
+              'results': {}}
+    for n in args.sizes:
+        report['results'][str(n)] = run_size(n, args.repeat, args.storage)
+    print_report(report, sys.stdout)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print('\nBaseline written to {}'.format(args.baseline))
+        return 0
+    if not exists(args.baseline):
+        print('\nNo baseline found, run with --save-baseline to create one')
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('storage') != args.storage:
+        print('\nBaseline was recorded with {} storage, not comparing'
+              .format(baseline.get('storage')))
+        return 0
+    regressions = compare(report, baseline, args.tolerance,
+                          args.memory_tolerance)
+    if regressions:
+        print('\nRegressions:')
+        for r in regressions:
+            print('  ' + r)
+        return 1
+    print('\nNo regressions against {}'.format(args.baseline))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
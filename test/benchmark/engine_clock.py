@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" The reminder engine against a fake clock.
+
+    Starts an engine on reminders that came due while nothing was running
+    and checks which are announced, summed up or dropped and what goes to
+    the history. Then runs the proactive pre notifications on timers the
+    test fires by hand and checks that the notice timer follows the
+    changes and that announced reminders get no notice. Exits with code 1
+    on the first failure.
+
+        python test/benchmark/engine_clock.py
+"""
+import importlib
+import queue
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from os.path import join
+from threading import Thread
+
+from harness import check, load_skill_module
+
+MINUTES = 60  # seconds
+HOURS = 60 * MINUTES
+
+
+class FakeClock:
+    """ Epoch time that only moves when the test says so. """
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeTimer(Thread):
+    """ threading.Timer stand-in that only runs when fired by the test. """
+    created = []
+
+    def __init__(self, when, function):
+        super().__init__()
+        self.when = when
+        self.function = function
+        self.cancelled = False
+        self.fired = False
+        FakeTimer.created.append(self)
+
+    def start(self):
+        pass
+
+    def cancel(self):
+        self.cancelled = True
+
+    def fire(self):
+        # The scheduler checks it runs on the timer it armed
+        self.fired = True
+        super().start()
+        self.join()
+
+    def run(self):
+        self.function()
+
+
+def main():
+    module = load_skill_module()
+    engine_module = importlib.import_module(module.__name__ + '.engine')
+    history = importlib.import_module(module.__name__ + '.history')
+    recurrence = importlib.import_module(module.__name__ + '.recurrence')
+    Reminder = module.Reminder
+    tz = timezone(timedelta(hours=2))
+    clock = FakeClock(int(datetime(2026, 10, 16, 12, 0,
+                                   tzinfo=tz).timestamp()))
+    now = clock.now
+    directory = tempfile.mkdtemp(prefix='reminder-engine-')
+
+    # Catch up at startup
+    grace, expiry = engine_module.GRACE, engine_module.EXPIRY
+    daily = recurrence.Recurrence(now - 2 * HOURS, 'DAILY')
+    reminders = [
+        Reminder('just missed', now - 5 * MINUTES),
+        Reminder('at the grace', now - grace + 1),
+        Reminder('this morning', now - 3 * HOURS),
+        Reminder('take pills', daily.start, rule=str(daily)),
+        Reminder('yesterday noon', now - expiry + MINUTES),
+        Reminder('two days ago', now - 2 * expiry),
+        Reminder('last week', now - 7 * 24 * HOURS),
+        Reminder('later today', now + 3 * HOURS),
+    ]
+    path = join(directory, 'reminders.db')
+    store = module.SQLiteBackend(path)
+    store.save_many(reminders)
+    archive = history.HistoryArchive(join(directory, 'history'), lambda: tz)
+    fired = queue.Queue()
+    engine = engine_module.ReminderEngine(store, fired.put, lambda: tz,
+                                          clock, history=archive)
+    try:
+        check(sorted(r.name for r in engine.stale) ==
+              ['take pills', 'this morning', 'yesterday noon'],
+              'reminders overdue up to the expiry are stale')
+        check(sorted(r.name for r in engine.expired) ==
+              ['last week', 'two days ago'],
+              'older reminders are expired')
+        check([r.due for r in engine.stale if r.rule] == [daily.start],
+              'stale reminders are copies as they were due')
+        check(sorted(r.name for r in engine.reminders) ==
+              ['at the grace', 'just missed', 'later today', 'take pills'],
+              'stale and expired occurrences are finished')
+        check(engine.reminders.get(reminders[3].id).due ==
+              daily.start + 24 * HOURS,
+              'a stale repeating reminder moves on to its next occurrence')
+
+        engine.start()
+        due = fired.get(timeout=5)
+        check(sorted(r.name for r in engine.due(due)) ==
+              ['at the grace', 'just missed'],
+              'reminders overdue within the grace are announced together')
+
+        entries = list(archive.entries(now - HOURS, now + HOURS))
+        check(all(e.at == now for e in entries) and
+              sorted((e.event, e.name) for e in entries) ==
+              [(history.EXPIRED, 'last week'),
+               (history.EXPIRED, 'two days ago'),
+               (history.MISSED, 'take pills'),
+               (history.MISSED, 'this morning'),
+               (history.MISSED, 'yesterday noon')],
+              'stale reminders are archived as missed, expired ones as '
+              'expired')
+        check([e.due for e in entries if e.name == 'take pills'] ==
+              [daily.start], 'the missed occurrence is archived')
+        check(sorted(r.name for r in module.SQLiteBackend(path)
+                     .load_timed()) ==
+              ['at the grace', 'just missed', 'later today', 'take pills'],
+              'the catch up is committed to the store')
+    finally:
+        engine.shutdown()
+        store.close()
+
+    store = module.SQLiteBackend(path)
+    engine = engine_module.ReminderEngine(store, fired.put, lambda: tz,
+                                          clock, history=archive)
+    try:
+        check(not engine.stale and not engine.expired and
+              len(list(archive.entries(now - HOURS, now + HOURS))) == 5,
+              'reminders within the grace are not caught up twice')
+    finally:
+        engine.shutdown()
+        store.close()
+
+    # Proactive pre notifications
+    scheduler = importlib.import_module(module.__name__ + '.scheduler')
+    # Timers the test fires, armed for the full delay
+    scheduler.MAX_SLEEP = 24 * HOURS
+    engine_module.ReminderScheduler = (
+        lambda callback, clock: scheduler.ReminderScheduler(
+            callback, clock, lambda delay, function: FakeTimer(
+                clock() + delay, function)))
+    store = module.SQLiteBackend(':memory:')
+    notified = []
+
+    def on_notice():
+        # What the skill does with the notice
+        for r in engine.pre_notifications(clock()):
+            notified.append(r.name)
+            engine.activate(r.id)
+
+    def notice_timer():
+        """ The armed timer of the notices, None if there is none. """
+        armed = [t for t in FakeTimer.created if not t.cancelled and
+                 not t.fired and t.function.__self__ is engine.notices]
+        return armed[-1] if armed else None
+
+    def notice_time():
+        timer = notice_timer()
+        return timer.when if timer else None
+
+    dentist = Reminder('dentist', now + 10 * MINUTES, now + 5 * MINUTES)
+    meeting = Reminder('meeting', now + 20 * MINUTES, now + 8 * MINUTES)
+    store.save_many([dentist, meeting, Reminder('no notice', now + HOURS)])
+    engine = engine_module.ReminderEngine(store, fired.put, lambda: tz,
+                                          clock, on_notice=on_notice)
+    try:
+        engine.start()
+        notice_timer().fire()
+        check(not notified and notice_time() == dentist.notify,
+              'the notices start at the next pre notification')
+        call = engine.add(Reminder('call mom', now + 12 * MINUTES,
+                                   now + 2 * MINUTES))
+        check(notice_time() == call.notify,
+              'adding an earlier pre notification re-arms the timer')
+        engine.reschedule(call.id, now + 40 * MINUTES)
+        check(call.notify == now + 30 * MINUTES and
+              notice_time() == dentist.notify,
+              'rescheduling past the next one re-arms the timer')
+        engine.remove(dentist.id)
+        check(notice_time() == meeting.notify,
+              'removing the next one re-arms the timer')
+        engine.remove(meeting.id)
+        engine.add(meeting)
+        check(notice_time() == meeting.notify,
+              'adding it back re-arms the timer')
+
+        clock.now = meeting.notify
+        notice_timer().fire()
+        check(notified == ['meeting'] and notice_time() == call.notify,
+              'a due pre notification is given, the timer moves on')
+        water = engine.add(Reminder('water plants', now + 25 * MINUTES,
+                                    now + 9 * MINUTES))
+        clock.now = water.notify
+        notice_timer().fire()
+        check(notified == ['meeting', 'water plants'],
+              'a reminder that got its notice is not notified again')
+
+        # Announced, repeating with the pre notification time passed
+        gym = engine.add(Reminder('gym', now + 11 * MINUTES,
+                                  now + 10 * MINUTES))
+        clock.now = gym.due
+        engine.fire([gym.id])
+        clock.now += MINUTES
+        check(gym.notify < clock() < gym.due and
+              engine.pre_notifications(clock()) == [],
+              'an announced reminder gets no pre notification')
+    finally:
+        engine.shutdown()
+        store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Run the reminder skill outside of Mycroft.
+
+    The stubs directory is put in front of sys.path, so the skill imports the
+    stand-in mycroft package instead of mycroft-core.
+"""
+import importlib.util
+import random
+import shutil
+import sys
+from os.path import abspath, dirname, join
+
+BENCH_DIR = dirname(abspath(__file__))
+SKILL_DIR = dirname(dirname(BENCH_DIR))
+MODULE_NAME = 'reminder_skill'
+
+sys.path.insert(0, join(BENCH_DIR, 'stubs'))
+
+WORDS = ('dentist', 'appointment', 'garbage', 'laundry', 'call', 'mom',
+         'dad', 'pay', 'rent', 'water', 'plants', 'vitamin', 'pill',
+         'meeting', 'team', 'dinner', 'family', 'walk', 'dog', 'groceries',
+         'car', 'service', 'birthday', 'anna', 'tax', 'return', 'gym',
+         'yoga', 'doctor', 'pharmacy', 'library', 'books', 'invoice')
+
+
+def load_skill_module():
+    """ Import the skill as a package, the way Mycroft loads it. """
+    if MODULE_NAME not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            MODULE_NAME, join(SKILL_DIR, '__init__.py'),
+            submodule_search_locations=[SKILL_DIR])
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[MODULE_NAME] = module
+        spec.loader.exec_module(module)
+    return sys.modules[MODULE_NAME]
+
+
+def check(condition, description):
+    """ Print the outcome of a check, exit with code 1 if it failed. """
+    print('{} {}'.format('ok  ' if condition else 'FAIL', description))
+    if not condition:
+        sys.exit(1)
+
+
+def synthetic_reminders(n, start, seed=1, overdue=0):
+    """ n reminders spread over the year after epoch time start.
+
+        A fraction overdue of them came due in the week before start.
+    """
+    module = load_skill_module()
+    rnd = random.Random(seed)
+    reminders = []
+    for _ in range(n):
+        name = ' '.join(rnd.sample(WORDS, rnd.randint(1, 3)))
+        if overdue and rnd.random() < overdue:
+            due = start - rnd.randint(60, 7 * 24 * 3600)
+        else:
+            due = start + rnd.randint(60, 365 * 24 * 3600)
+        notify = due - rnd.choice((0, 0, 300, 900))
+        reminders.append(module.Reminder(name, due, notify))
+    return reminders
+
+
+def make_skill(reminders=(), storage='sqlite', settings=None, bus=None):
+    """ Create and initialize a skill holding the given reminders. """
+    module = load_skill_module()
+    skill = module.create_skill()
+    if bus is not None:
+        skill.bind(bus)
+    skill.root_dir = SKILL_DIR
+    skill.settings['storage'] = storage
+    skill.settings.update(settings or {})
+    if storage == 'sqlite':
+        store = module.SQLiteBackend(join(skill.file_system.path,
+                                          'reminders.db'))
+        with store.transaction():
+            for r in reminders:
+                store.save(r)
+            store.set_meta('settings_imported', '1')
+        store.close()
+    else:
+        skill.settings['timed_reminders'] = [r.to_json() for r in reminders]
+    skill.initialize()
+    return skill
+
+
+def close_skill(skill):
+    skill.shutdown()
+    shutil.rmtree(skill.file_system.path, ignore_errors=True)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Day files of the reminder history.
+
+    Records a week of events, one day at a time, and checks that earlier
+    days are compressed, that days past the retention are deleted and that
+    reading a time range finds the entries in plain and compressed files.
+    Exits with code 1 on the first failure.
+
+        python test/benchmark/history_archive.py
+"""
+import gzip
+import importlib
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from harness import check, load_skill_module
+
+RETENTION = 3  # days
+
+
+def main():
+    module = load_skill_module()
+    history = importlib.import_module(module.__name__ + '.history')
+    tz = timezone(timedelta(hours=2))
+    directory = tempfile.mkdtemp(prefix='reminder-history-')
+    archive = history.HistoryArchive(directory, lambda: tz, RETENTION)
+    first = datetime(2026, 10, 10, 12, 0, tzinfo=tz)
+
+    def at(day, hour=12):
+        return int((first + timedelta(days=day, hours=hour - 12))
+                   .timestamp())
+
+    for day in range(7):
+        due = at(day) - 60
+        archive.record(history.COMPLETED,
+                       [module.Reminder('day {}'.format(day), due)], at(day))
+        archive.record(history.CANCELLED, ['note {}'.format(day)],
+                       at(day, 13))
+
+    files = sorted(os.listdir(directory))
+    check(files == ['2026-10-13.jsonl.gz', '2026-10-14.jsonl.gz',
+                    '2026-10-15.jsonl.gz', '2026-10-16.jsonl'],
+          'earlier days are compressed, older ones deleted {}'.format(files))
+    with gzip.open(os.path.join(directory, files[0]), 'rt') as f:
+        lines = f.readlines()
+    check(len(lines) == 2 and '"day 3"' in lines[0],
+          'a compressed day holds the entries of the day')
+
+    entries = list(archive.entries(at(0), at(7)))
+    check([e.name for e in entries] ==
+          ['day 3', 'note 3', 'day 4', 'note 4', 'day 5', 'note 5',
+           'day 6', 'note 6'],
+          'entries of the kept days are read oldest first')
+    check([e.due for e in entries[::2]] == [at(d) - 60 for d in range(3, 7)]
+          and all(e.due is None for e in entries[1::2]),
+          'untimed entries have no due time')
+    check([e.name for e in archive.entries(at(4, 13), at(5, 13))] ==
+          ['note 4', 'day 5'],
+          'a time range spanning two days reads both')
+    check([e.name for e in archive.entries(at(0), at(7),
+                                           history.REMINDED)] ==
+          ['day 3', 'day 4', 'day 5', 'day 6'],
+          'entries are filtered by event')
+
+    # A late event of a compressed day goes to a plain file again, which
+    # the next roll-over appends to the day as another gzip member
+    archive.record(history.CANCELLED, ['late note'], at(4, 20))
+    archive.record(history.COMPLETED,
+                   [module.Reminder('day 7', at(7) - 60)], at(7))
+    check([e.name for e in archive.entries(at(4), at(5))] ==
+          ['day 4', 'note 4', 'late note'],
+          'late entries are appended to the compressed day')
+    check(sorted(os.listdir(directory)) ==
+          ['2026-10-14.jsonl.gz', '2026-10-15.jsonl.gz',
+           '2026-10-16.jsonl.gz', '2026-10-17.jsonl'],
+          'the retention moves on with the days')
+
+    with open(os.path.join(directory, '2026-10-17.jsonl'), 'a') as f:
+        f.write('{"event": "completed", "at": ')
+    check([e.name for e in archive.entries(at(7), at(8))] == ['day 7'],
+          'a torn last line is skipped')
+
+    archive.retention = 1
+    archive.prune(at(7))
+    info = archive.info()
+    check(sorted(os.listdir(directory)) ==
+          ['2026-10-16.jsonl.gz', '2026-10-17.jsonl'] and
+          info['days'] == 2 and info['bytes'] > 0,
+          'pruning applies a shorter retention')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Matching reminder names.
+
+    Ranks names in the NameIndex by exact, prefix and fuzzy token matches
+    and checks which reminders are offered for deletion. Exits with code 1
+    on the first failure.
+
+        python test/benchmark/name_matching.py
+"""
+import importlib
+import sys
+import time
+
+from harness import check, close_skill, load_skill_module, make_skill
+
+
+def main():
+    module = load_skill_module()
+    search = importlib.import_module(module.__name__ + '.search')
+
+    # Ranking
+    names = ['dentsit', 'dentists', 'dentist', 'denim jacket', 'deodorant',
+             'indent', 'tennis']
+    index = search.NameIndex()
+    for key, name in enumerate(names):
+        index.add(key, name)
+    ranked = [(score, names[key]) for score, key in
+              index.search('Dentist', limit=10, cutoff=0)]
+    check([name for _, name in ranked] == ['dentist', 'dentists', 'dentsit'],
+          'exact matches rank before prefix and fuzzy ones')
+    check([score for score, _ in ranked] ==
+          [search.EXACT, search.PREFIX, ranked[2][0]] and
+          search.FUZZY * search.FUZZY_CUTOFF <= ranked[2][0] < search.FUZZY,
+          'fuzzy matches are weighed by their similarity')
+    check([names[key] for _, key in index.search('dentist', cutoff=0.7)] ==
+          ['dentist', 'dentists'],
+          'matches below the cutoff are dropped')
+    check(index.search('garbage', cutoff=0) == [] and
+          index.search('dnetist', cutoff=0) == [],
+          'unrelated names and other first letters don\'t match')
+
+    # Offered for deletion
+    now = int(time.time())
+    skill = make_skill([module.Reminder(name, now + (k + 1) * 3600)
+                        for k, name in enumerate(
+                            ['call dad', 'dentist appointment', 'pay rent',
+                             'indent the code', 'tennis'])])
+    try:
+        check([r.name for _, r in
+               skill.search_names('dentist', 'timed_reminders')] ==
+              ['dentist appointment'],
+              'deleting "dentist" finds the name starting with it only')
+        check(skill.search_names('groceries', 'timed_reminders') == [],
+              'deleting an unknown name finds nothing')
+    finally:
+        close_skill(skill)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Two devices sharing one reminder service on the stubbed messagebus.
+
+    Checks that reminders added on one device show up on the other, that
+    fired reminders are announced on both and that either device can
+    snooze and cancel them. Exits with code 1 on the first failure.
+
+        python test/benchmark/service_roundtrip.py
+"""
+import sys
+import tempfile
+import time
+from os.path import join
+
+from harness import check, close_skill, load_skill_module, make_skill
+
+from mycroft.messagebus.client import MessageBusClient
+from mycroft.messagebus.message import Message
+from mycroft.util.time import default_timezone
+
+
+def utterance(text):
+    return Message('recognizer_loop:utterance', {'utterance': text})
+
+
+def main():
+    module = load_skill_module()
+    service_module = sys.modules[module.__name__ + '.service']
+    bus = MessageBusClient()
+    directory = tempfile.mkdtemp()
+    store = module.SQLiteBackend(join(directory, 'service.db'))
+    history = module.HistoryArchive(join(directory, 'history'),
+                                    default_timezone)
+    service = service_module.ReminderService(bus, store, default_timezone,
+                                             history=history)
+    settings = {'reminder_service': True, 'metrics_interval': 0}
+    a = make_skill(settings=settings, bus=bus)
+    b = make_skill(settings=settings, bus=bus)
+    try:
+        check(a.scheduler is None and b.scheduler is None,
+              'devices use the service')
+
+        due = int(time.time()) + 3600
+        a.engine.add(module.Reminder('water the plants', due))
+        r = next(iter(b.reminders), None)
+        check(r is not None and r.name == 'water the plants' and
+              r.due == due, 'reminder added on A is listed on B')
+
+        service._fire([r.id])
+        check(any('water the plants' in s for s in a.spoken) and
+              any('water the plants' in s for s in b.spoken),
+              'fired reminder is announced on both devices')
+        check(r.id in a.cancelable and r.id in b.cancelable,
+              'fired reminder is active on both devices')
+
+        b.snooze_active(utterance('snooze'))
+        check(not a.cancelable and a.reminders.get(r.id).due < due,
+              'snooze on B reschedules the reminder on A')
+
+        service._fire([r.id])
+        b.cancel_active(utterance('cancel'))
+        check(not a.reminders and not b.reminders and
+              not service.engine.reminders,
+              'cancel on B removes the reminder everywhere')
+        now = int(time.time())
+        check([e.name for e in a.engine.archived(now - 60, now + 60)] ==
+              ['water the plants'], 'A reads the history of the service')
+
+        a.engine.add(module.Reminder('call mom', due))
+        b.responses.append('yes')
+        b.clear_all(utterance('clear all'))
+        check(not a.reminders and not store.load_timed(),
+              'clearing on B clears the service')
+    finally:
+        close_skill(a)
+        close_skill(b)
+        service.shutdown()
+        store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
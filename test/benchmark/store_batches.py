@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Batched writes to the SQLite store.
+
+    Checks that a batch of timed or untimed reminders is written in one
+    transaction, that other connections see all of it or nothing and that
+    a failure partway through rolls the whole batch back, in the store and
+    in the skill. Exits with code 1 on the first failure.
+
+        python test/benchmark/store_batches.py
+"""
+import json
+import sys
+import tempfile
+import time
+from os.path import join
+
+from harness import check, close_skill, load_skill_module, make_skill
+
+BATCH = 50
+
+
+def failing(items, n):
+    """ The first n items, then an error. """
+    for k, item in enumerate(items):
+        if k == n:
+            raise RuntimeError('failed at {}'.format(item))
+        yield item
+
+
+def transactions(statements):
+    """ The statements grouped by transaction, without BEGIN and COMMIT.
+    """
+    groups = []
+    for statement in statements:
+        if statement == 'BEGIN':
+            groups.append([])
+        elif statement not in ('COMMIT', 'ROLLBACK'):
+            groups[-1].append(statement.split()[0])
+    return groups
+
+
+def main():
+    module = load_skill_module()
+    now = int(time.time())
+    reminders = [module.Reminder('batch {}'.format(k), now + k * 60)
+                 for k in range(BATCH)]
+    names = ['note {}'.format(k) for k in range(BATCH)]
+    directory = tempfile.mkdtemp(prefix='reminder-store-')
+    path = join(directory, 'reminders.db')
+    store = module.SQLiteBackend(path)
+    reader = module.SQLiteBackend(path)
+    statements = []
+    store.conn.set_trace_callback(statements.append)
+    try:
+        store.save_many(reminders)
+        with store.transaction():
+            for name in names:
+                store.add_untimed(name)
+            seen = reader.load_untimed()
+        check(transactions(statements) == [['INSERT'] * BATCH] * 2,
+              'a batch is written in one transaction')
+        check(seen == [] and len(reader.load_timed()) == BATCH and
+              reader.load_untimed() == names,
+              'other connections see the batch once it is committed')
+
+        del statements[:]
+        try:
+            store.save_many(failing(reminders + [module.Reminder(
+                'late', now + 3600)], BATCH))
+        except RuntimeError:
+            pass
+        try:
+            with store.transaction():
+                store.clear_timed()
+                for name in failing(['more'] * BATCH, BATCH // 2):
+                    store.add_untimed(name)
+        except RuntimeError:
+            pass
+        check(statements.count('ROLLBACK') == 2 and
+              'COMMIT' not in statements,
+              'a failure partway through rolls the batch back')
+        check(len(store.load_timed()) == len(reader.load_timed()) == BATCH
+              and reader.load_untimed() == names,
+              'nothing of a rolled back batch is stored')
+    finally:
+        store.close()
+        reader.close()
+
+    skill = make_skill()
+    try:
+        import_path = join(directory, 'import.jsonl')
+        with open(import_path, 'w') as f:
+            for name in names:
+                f.write(json.dumps({'name': name}) + '\n')
+        add_untimed = skill.store.add_untimed
+
+        def add_untimed_failing(name):
+            if name == names[BATCH // 2]:
+                raise RuntimeError('failed at {}'.format(name))
+            add_untimed(name)
+
+        skill.store.add_untimed = add_untimed_failing
+        try:
+            skill.import_reminders(import_path)
+        except RuntimeError:
+            pass
+        check(skill.untimed == [] and skill.store.load_untimed() == [] and
+              skill.search_names('note', 'untimed_reminders') == [],
+              'the skill keeps no part of a rolled back batch')
+        skill.store.add_untimed = add_untimed
+        counts = skill.import_reminders(import_path)
+        check(counts['untimed'] == BATCH and skill.untimed == names and
+              skill.store.load_untimed() == names,
+              'the batch is stored when retried')
+    finally:
+        close_skill(skill)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Concurrent intents and scheduler ticks against one skill.
+
+    Several threads add, fire, snooze, cancel, delete, import and list
+    reminders at the same time, the way intent handlers, bus requests and
+    the scheduler thread do on a device. The workers must finish without
+    deadlocking, and afterwards the index, the snapshot read by the
+    intents, the active reminders, the scheduler and the database must
+    agree. Exits with code 1 on the first failure.
+
+        python test/benchmark/stress_reminder.py
+        python test/benchmark/stress_reminder.py --threads 8 --rounds 500
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from os.path import join
+
+from harness import (check, close_skill, load_skill_module, make_skill,
+                     synthetic_reminders)
+
+from mycroft.messagebus.message import Message
+
+
+class Stress:
+    """ The concurrent workload, each worker picks random operations. """
+    def __init__(self, skill, rounds, seed):
+        self.module = load_skill_module()
+        self.skill = skill
+        self.rounds = rounds
+        self.seed = seed
+        self.errors = []
+        self.kept = []  # ids of added reminders no operation removes
+        self.kept_lock = threading.Lock()
+        self.directory = tempfile.mkdtemp(prefix='reminder-stress-')
+
+    def add(self, rnd, n):
+        when = self.module.now_local() + timedelta(days=rnd.randint(1, 60),
+                                                   minutes=rnd.randint(0, 59))
+        self.skill._ReminderSkill__save_reminder_local(
+            'stress {}'.format(n), when)
+
+    def keep(self, rnd, n):
+        """ Add a reminder far after everything else, nothing touches it. """
+        r = self.module.Reminder('kept {}'.format(n),
+                                 int(time.time()) + 400 * 24 * 3600)
+        self.skill.engine.add(r)
+        with self.kept_lock:
+            self.kept.append(r.id)
+
+    def fire(self, rnd, n):
+        first = self.skill.reminders.upcoming(3)
+        self.skill._ReminderSkill__check_reminder(
+            [r.id for r in first if not r.name.startswith('kept')])
+
+    def snooze(self, rnd, n):
+        self.skill.snooze_active(Message('', {'utterance': 'snooze'}))
+
+    def cancel(self, rnd, n):
+        self.skill.cancel_active(Message('', {'utterance': 'cancel'}))
+
+    def delete_day(self, rnd, n):
+        day = self.module.now_local() + timedelta(days=rnd.randint(1, 60))
+        with self.skill.engine.transaction():
+            for when, r in self.skill.reminders_on_day(day):
+                if not r.name.startswith('kept'):
+                    self.skill.remove_by_id(r.id)
+
+    def delete_name(self, rnd, n):
+        matches = self.skill.search_names('stress {}'.format(rnd.randint(
+            0, n)), 'timed_reminders', cutoff=0.9)
+        if matches:
+            self.skill.remove_by_id(matches[0][1].id)
+
+    def list(self, rnd, n):
+        day = self.module.now_local() + timedelta(days=rnd.randint(0, 60))
+        self.skill.reminders_on_day(day)
+        self.skill.get_next_reminder(Message('', {}))
+        self.skill.reminders.snapshot()
+
+    def notify(self, rnd, n):
+        self.skill._ReminderSkill__give_pre_notifications(int(time.time()))
+
+    def untimed(self, rnd, n):
+        self.skill._ReminderSkill__save_untimed_reminder('note {}'.format(n))
+        if rnd.random() < 0.3:
+            self.skill.remove_untimed('note {}'.format(rnd.randint(0, n)))
+
+    def import_file(self, rnd, n):
+        """ Import untimed notes and a few timed reminders, as sent with
+            skill.reminder.import.
+        """
+        path = join(self.directory, 'import-{}.jsonl'.format(n))
+        now = int(time.time())
+        with open(path, 'w') as f:
+            for k in range(rnd.randint(100, 600)):
+                entry = {'name': 'imported {} {}'.format(n, k)}
+                if k % 10 == 0:
+                    entry['due'] = now + rnd.randint(1, 60) * 24 * 3600
+                f.write(json.dumps(entry) + '\n')
+        self.skill.import_reminders(path)
+
+    OPERATIONS = ('add', 'add', 'keep', 'fire', 'fire', 'snooze', 'cancel',
+                  'delete_day', 'delete_name', 'list', 'list', 'notify',
+                  'untimed', 'untimed', 'import_file')
+
+    def worker(self, number):
+        rnd = random.Random(self.seed + number)
+        try:
+            for i in range(self.rounds):
+                n = number * self.rounds + i
+                getattr(self, rnd.choice(self.OPERATIONS))(rnd, n)
+        except Exception as e:
+            self.errors.append((number, repr(e)))
+            raise
+
+    def run(self, threads, timeout):
+        """ Returns (bool): True if all workers finished within timeout
+            seconds, False if they deadlocked.
+        """
+        workers = [threading.Thread(target=self.worker, args=(i,),
+                                    daemon=True)
+                   for i in range(threads)]
+        for w in workers:
+            w.start()
+        deadline = time.monotonic() + timeout
+        for w in workers:
+            w.join(max(deadline - time.monotonic(), 0))
+        return not any(w.is_alive() for w in workers)
+
+
+def check_consistency(skill, stress):
+    engine = skill.engine
+    index = engine.index
+    check(not stress.errors,
+          'no worker failed {}'.format(stress.errors[:3]))
+    check(sorted(index._order) == index._order and
+          {i for _, i in index._order} == set(index._by_id) and
+          all(index._by_id[i].due == due for due, i in index._order),
+          'index order matches the reminders')
+    queued = [(notify, index._by_id[i]) for notify, i in index._notices
+              if i in index._by_id]
+    check(all(r.notify == notify < r.due for notify, r in queued) and
+          sorted(index._notices) == index._notices,
+          'pre notification queue matches the reminders')
+    check([(r.id, r.due, r.name) for r in skill.reminders] ==
+          [(r.id, r.due, r.name) for r in index],
+          'snapshot matches the index')
+    stored = {r.id: r.due for r in engine.store.load_timed()}
+    check(stored == {r.id: r.due for r in index},
+          'database matches the index')
+    check(all(r.id in index and r.active for r in engine.active),
+          'active reminders are in the index')
+    entries = engine.scheduler._entries
+    check(set(entries) == set(index._by_id) and
+          all(entries[r.id][0] == r.due for r in index),
+          'every reminder is scheduled at its due time')
+    check(all(i in index for i in stress.kept),
+          'untouched reminders survived ({})'.format(len(stress.kept)))
+    check(sorted(skill.untimed) == sorted(skill.store.load_untimed()),
+          'untimed reminders match the database')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--threads', type=int, default=6)
+    parser.add_argument('--rounds', type=int, default=300)
+    parser.add_argument('--reminders', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=60,
+                        help='seconds before the workers count as '
+                             'deadlocked (default: 60)')
+    args = parser.parse_args(argv)
+
+    start = int(time.time())
+    skill = make_skill(synthetic_reminders(args.reminders, start,
+                                           seed=args.seed))
+    try:
+        stress = Stress(skill, args.rounds, args.seed)
+        began = time.perf_counter()
+        finished = stress.run(args.threads, args.timeout)
+        print('{} threads x {} rounds in {:.2f}s'.format(
+            args.threads, args.rounds, time.perf_counter() - began))
+        if not finished:
+            # The stuck workers hold the locks needed to shut down
+            print('FAIL workers finished without deadlock', flush=True)
+            os._exit(1)
+        check(finished, 'workers finished without deadlock')
+        check_consistency(skill, stress)
+    finally:
+        close_skill(skill)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+""" Minimal stand-in for the parts of mycroft-core used by the skill.
+
+    Only meant for running the benchmarks on a machine without Mycroft; the
+    dialog methods record what would have been spoken and answer questions
+    from a scripted list.
+"""
+import csv
+import logging
+import tempfile
+from collections import OrderedDict, deque
+from os.path import exists, join
+
+from mycroft.messagebus.client import MessageBusClient
+
+
+class FileSystemAccess:
+    def __init__(self):
+        self.path = tempfile.mkdtemp(prefix='reminder-bench-')
+
+
+class MycroftSkill:
+    def __init__(self, name=None, bus=None):
+        self.name = name or self.__class__.__name__
+        self.lang = 'en-us'
+        self.settings = {}
+        self.bus = bus or MessageBusClient()
+        self.log = logging.getLogger(self.name)
+        self.file_system = FileSystemAccess()
+        self.root_dir = None
+        self.responses = deque()  # scripted answers to questions
+        self.spoken = deque(maxlen=100)
+        self.spoken_count = 0
+        self._dialogs = {}
+
+    def bind(self, bus):
+        self.bus = bus
+
+    def _render(self, name, data=None):
+        if name not in self._dialogs:
+            path = join(self.root_dir or '', 'dialog', self.lang,
+                        name + '.dialog')
+            template = name
+            if exists(path):
+                with open(path) as f:
+                    template = f.readline().strip()
+            self._dialogs[name] = template.replace('{{', '{') \
+                                          .replace('}}', '}')
+        try:
+            return self._dialogs[name].format(**(data or {}))
+        except (KeyError, IndexError):
+            return self._dialogs[name]
+
+    def speak(self, utterance, expect_response=False, wait=False):
+        self.spoken.append(utterance)
+        self.spoken_count += 1
+
+    def speak_dialog(self, key, data=None, expect_response=False,
+                     wait=False):
+        self.speak(self._render(key, data))
+
+    def translate(self, text, data=None):
+        return self._render(text, data)
+
+    def translate_list(self, list_name, data=None):
+        path = join(self.root_dir or '', 'dialog', self.lang,
+                    list_name + '.list')
+        if not exists(path):
+            return []
+        with open(path) as f:
+            return [line.strip() for line in f if line.strip()]
+
+    def translate_namedvalues(self, name, delim=','):
+        path = join(self.root_dir or '', 'dialog', self.lang,
+                    name + '.value')
+        values = OrderedDict()
+        if exists(path):
+            with open(path) as f:
+                for row in csv.reader(f, delimiter=delim):
+                    if len(row) == 2 and not row[0].startswith('#'):
+                        values[row[0]] = row[1]
+        return values
+
+    def get_response(self, dialog='', data=None, validator=None,
+                     on_fail=None, num_retries=-1):
+        return self.responses.popleft() if self.responses else None
+
+    def ask_yesno(self, prompt, data=None):
+        return self.responses.popleft() if self.responses else None
+
+    def add_event(self, name, handler, handler_info=None, once=False):
+        self.bus.on(name, handler)
+
+    def remove_event(self, name):
+        self.bus.remove_all_listeners(name)
+
+    def schedule_event(self, *args, **kwargs):
+        pass
+
+    def schedule_repeating_event(self, *args, **kwargs):
+        pass
+
+    def cancel_scheduled_event(self, name):
+        pass
+
+
+def intent_file_handler(intent_file):
+    def decorator(func):
+        return func
+    return decorator
@@ -0,0 +1 @@
+from mycroft.messagebus.message import Message
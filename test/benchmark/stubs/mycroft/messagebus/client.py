@@ -0,0 +1,52 @@
+from collections import defaultdict
+from threading import Lock
+
+
+class MessageBusClient:
+    """ In-process bus delivering messages synchronously to the handlers.
+    """
+    def __init__(self):
+        self.handlers = defaultdict(list)
+        self.emitted = []
+        self._lock = Lock()
+
+    def on(self, msg_type, handler):
+        with self._lock:
+            self.handlers[msg_type].append(handler)
+
+    once = on
+
+    def remove(self, msg_type, handler):
+        with self._lock:
+            if handler in self.handlers[msg_type]:
+                self.handlers[msg_type].remove(handler)
+
+    def remove_all_listeners(self, msg_type):
+        with self._lock:
+            self.handlers.pop(msg_type, None)
+
+    def emit(self, message):
+        with self._lock:
+            self.emitted.append(message)
+            handlers = list(self.handlers[message.msg_type])
+        for handler in handlers:
+            handler(message)
+
+    def wait_for_response(self, message, reply_type=None, timeout=3.0):
+        """ Emit message and return the reply, which is delivered before
+            emit() returns on this bus, or None.
+        """
+        replies = []
+        reply_type = reply_type or message.msg_type + '.response'
+        self.on(reply_type, replies.append)
+        try:
+            self.emit(message)
+        finally:
+            self.remove(reply_type, replies.append)
+        return replies[0] if replies else None
+
+    def run_in_thread(self):
+        pass
+
+    def close(self):
+        pass
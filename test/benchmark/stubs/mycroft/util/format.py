@@ -0,0 +1,17 @@
+def nice_time(dt, lang=None, speech=True, use_24hour=False,
+              use_ampm=False):
+    return dt.strftime('%H:%M')
+
+
+def nice_date(dt, lang=None, now=None):
+    return dt.strftime('%A %d %B %Y')
+
+
+def join_list(items, connector, sep=None, lang=None):
+    items = [str(i) for i in items]
+    if not items:
+        return ''
+    if len(items) == 1:
+        return items[0]
+    return '{} {} {}'.format((sep or ', ').join(items[:-1]), connector,
+                             items[-1])
@@ -0,0 +1,3 @@
+import logging
+
+LOG = logging.getLogger('mycroft')
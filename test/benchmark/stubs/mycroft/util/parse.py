@@ -0,0 +1,30 @@
+""" Tiny parsers understanding 'in N minutes/hours/days' only. """
+import re
+from datetime import timedelta
+
+DURATION = re.compile(r'(\d+)\s*(minute|hour|day)s?')
+
+
+def extract_duration(text, lang=None):
+    match = DURATION.search(text or '')
+    if not match:
+        return None
+    amount, unit = int(match.group(1)), match.group(2)
+    delta = timedelta(**{unit + 's': amount})
+    return [delta, (text[:match.start()] + text[match.end():]).strip()]
+
+
+def extract_datetime(text, anchorDate=None, lang=None, default_time=None):
+    duration = extract_duration(text, lang)
+    if duration is None or anchorDate is None:
+        return None
+    return [anchorDate + duration[0], duration[1]]
+
+
+def extract_number(text, short_scale=True, ordinals=False, lang=None):
+    match = re.search(r'\d+', text or '')
+    return int(match.group()) if match else False
+
+
+def normalize(text, lang=None, remove_articles=True):
+    return text
@@ -0,0 +1,13 @@
+from datetime import datetime, timezone
+
+
+def default_timezone():
+    return datetime.now(timezone.utc).astimezone().tzinfo
+
+
+def now_local(tz=None):
+    return datetime.now(tz or default_timezone())
+
+
+def to_local(dt):
+    return dt.astimezone(default_timezone())
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" iCalendar import and export and the recurrence rules they carry.
+
+    Exports reminders with write_ical and reads them back with read_ical,
+    imports alarms, rules the skill can't express and malformed JSON Lines
+    entries, drops duplicates across import batches and expands daily
+    rules across the daylight saving changes of Europe/Berlin. Exits with
+    code 1 on the first failure.
+
+        python test/benchmark/transfer_roundtrip.py
+"""
+import importlib
+import json
+import sys
+import tempfile
+import time as clock
+from collections import Counter
+from datetime import datetime, time
+from os.path import join
+
+from harness import check, close_skill, load_skill_module, make_skill
+
+TIMEZONE = 'Europe/Berlin'
+DEFAULT_TIME = time(8, 0)
+
+
+def ical(*lines):
+    """ Lines of a calendar holding the given component lines. """
+    return ['BEGIN:VCALENDAR\r\n', 'VERSION:2.0\r\n'] + [
+        line + '\r\n' for line in lines] + ['END:VCALENDAR\r\n']
+
+
+def main():
+    module = load_skill_module()
+    transfer = importlib.import_module(module.__name__ + '.transfer')
+    recurrence = importlib.import_module(module.__name__ + '.recurrence')
+    Reminder = module.Reminder
+    tz = transfer.gettz(TIMEZONE)
+
+    def local(*args):
+        return int(datetime(*args, tzinfo=tz).timestamp())
+
+    def import_ical(lines, now):
+        counts = Counter()
+        items = transfer.read_ical(lines)
+        return (list(transfer.to_reminders(items, tz, now, DEFAULT_TIME,
+                                           counts)), counts)
+
+    now = local(2026, 10, 1, 12, 0)
+
+    # Round trip
+    daily = recurrence.Recurrence(local(2026, 10, 5, 7, 30), 'DAILY',
+                                  exdates=[local(2026, 10, 7, 7, 30)])
+    weekly = recurrence.Recurrence(local(2026, 10, 6, 18, 0), 'WEEKLY', 2,
+                                   ('TU', 'TH'),
+                                   until=local(2026, 12, 31, 18, 0))
+    reminders = [
+        Reminder('dentist; bring the card, too', local(2026, 10, 20, 9, 15),
+                 local(2026, 10, 20, 8, 45)),
+        Reminder('take pills', daily.start, rule=str(daily)),
+        Reminder('choir', weekly.start, weekly.start - 600,
+                 rule=str(weekly)),
+        Reminder('a reminder with a name longer than one folded line of '
+                 'seventy-five octets, ünïcödé included', local(2026, 11, 2)),
+    ]
+    untimed = ['buy milk', 'call mom']
+    # Split the way reading the exported file does
+    lines = ''.join(transfer.write_ical(reminders, untimed, tz,
+                                        now)).splitlines(True)
+    check(all(len(l.rstrip('\r\n').encode('utf-8')) <= transfer.ICAL_LINE
+              for l in lines) and any(l[0] == ' ' for l in lines),
+          'exported lines are folded to 75 octets')
+    pairs, counts = import_ical(lines, now)
+    check(not counts, 'export imports without errors {}'.format(
+        dict(counts)))
+    check([name for name, r in pairs if r is None] == untimed,
+          'untimed reminders survive the round trip')
+    imported = [r for name, r in pairs if r is not None]
+    check([(r.name, r.due, r.notify) for r in imported] ==
+          [(r.name, r.due, r.notify) for r in reminders],
+          'names, due times and pre notifications survive the round trip')
+    check([r.recurrence for r in imported] ==
+          [r.recurrence for r in reminders],
+          'rules and skipped occurrences survive the round trip')
+
+    # Alarms
+    pairs, counts = import_ical(ical(
+        'BEGIN:VEVENT', 'SUMMARY:meeting', 'DTSTART:20261020T100000',
+        'BEGIN:VALARM', 'TRIGGER:-PT15M', 'END:VALARM',
+        'BEGIN:VALARM', 'TRIGGER:-P1DT2H', 'END:VALARM',
+        'BEGIN:VALARM', 'TRIGGER;RELATED=END:-PT3H', 'END:VALARM',
+        'BEGIN:VALARM', 'TRIGGER:PT5M', 'END:VALARM',
+        'END:VEVENT',
+        'BEGIN:VEVENT', 'SUMMARY:absolute alarm', 'DTSTART:20261021T100000',
+        'BEGIN:VALARM', 'TRIGGER;VALUE=DATE-TIME:20261021T090000Z',
+        'END:VALARM',
+        'END:VEVENT'), now)
+    (_, meeting), (_, absolute) = pairs
+    check(meeting.due == local(2026, 10, 20, 10, 0) and
+          meeting.due - meeting.notify == 26 * 3600,
+          'the earliest alarm before the start is the pre notification')
+    check(absolute.notify == absolute.due,
+          'alarms not relative to the start are ignored')
+
+    # Rules the skill can't express
+    pairs, counts = import_ical(ical(
+        'BEGIN:VEVENT', 'SUMMARY:rent', 'DTSTART:20261101T090000',
+        'RRULE:FREQ=MONTHLY;BYMONTHDAY=1', 'END:VEVENT',
+        'BEGIN:VEVENT', 'SUMMARY:new year', 'DTSTART:20270101T000000',
+        'RRULE:FREQ=YEARLY', 'END:VEVENT',
+        'BEGIN:VEVENT', 'SUMMARY:standup', 'DTSTART:20261002T093000',
+        'RRULE:FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR', 'END:VEVENT'), now)
+    check(counts['invalid'] == 2 and [n for n, _ in pairs] == ['standup'],
+          'unsupported RRULEs count as invalid, the rest is imported')
+
+    # Daylight saving time
+    pairs, counts = import_ical(ical(
+        'BEGIN:VEVENT', 'SUMMARY:walk the dog', 'DTSTART:20261023T080000',
+        'RRULE:FREQ=DAILY', 'END:VEVENT'), now)
+    rule = pairs[0][1].recurrence
+    autumn = list(rule.occurrences(local(2026, 10, 23), local(2026, 10, 28),
+                                   tz))
+    spring_rule = recurrence.Recurrence(local(2027, 3, 26, 8, 0), 'DAILY')
+    spring = list(spring_rule.occurrences(local(2027, 3, 26),
+                                          local(2027, 3, 31), tz))
+    check(all(datetime.fromtimestamp(t, tz).hour == 8
+              for t in autumn + spring) and
+          len(autumn) == len(spring) == 5,
+          'daily rules keep their wall clock time across DST changes')
+    check(autumn[2] - autumn[1] == 25 * 3600 and
+          spring[2] - spring[1] == 23 * 3600,
+          'the day of the DST change is 25 and 23 hours long')
+    check(rule.next_after(local(2026, 10, 24, 8, 0), tz) ==
+          local(2026, 10, 25, 8, 0),
+          'the next occurrence after the change is at 8:00 local time')
+
+    # Malformed JSON Lines entries
+    lines = ['[1, 2]', '"text"', '{"name": 5}', '{"name": null}',
+             '{"name": "far away", "due": 1e20}', '{"due": 1}',
+             '{"name": "rule", "due": "2026-10-20T08:00:00+02:00", '
+             '"rule": 5}', '{"name": "broken', '',
+             '{"name": "dentist", "due": "2026-10-20T08:00:00+02:00"}',
+             '{"name": "buy milk"}']
+    counts = Counter()
+    pairs = list(transfer.to_reminders(transfer.read_jsonl(lines), tz, now,
+                                       DEFAULT_TIME, counts))
+    check(counts == {'invalid': 8} and
+          [name for name, _ in pairs] == ['dentist', 'buy milk'],
+          'malformed JSON Lines entries count as invalid')
+
+    # Duplicates across import batches
+    skill = make_skill()
+    try:
+        directory = tempfile.mkdtemp(prefix='reminder-import-')
+        path = join(directory, 'import.jsonl')
+        due = int(clock.time()) + 24 * 3600
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+            for k in range(30):
+                f.write(json.dumps({'name': 'Pay Bill {}'.format(k % 10),
+                                    'due': due + k % 10}) + '\n')
+                f.write(json.dumps({'name': 'Note {}'.format(k % 5)}) + '\n')
+        module.IMPORT_BATCH = 7
+        counts = skill.import_reminders(path)
+        check(counts['invalid'] == 8 and counts['imported'] == 11 and
+              counts['untimed'] == 6 and counts['duplicates'] == 45 and
+              len(skill.reminders) == 11 and len(skill.untimed) == 6,
+              'duplicates in later batches are dropped {}'.format(counts))
+        counts = skill.import_reminders(path)
+        check(counts['imported'] == counts['untimed'] == 0 and
+              counts['duplicates'] == 62,
+              'importing the file again adds nothing')
+    finally:
+        close_skill(skill)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
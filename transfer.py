@@ -0,0 +1,455 @@
+# Copyright 2016 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Streaming import and export of reminders.
+
+    Readers turn iCalendar (VEVENT/VTODO) or JSON Lines input into items,
+    to_reminders() normalizes them to reminders, batched() groups them for
+    the store and unique() drops the duplicates of each batch. Every stage
+    is a generator, so files are processed line by line whatever their
+    size.
+
+    JSON Lines entries look like
+
+        {"name": "dentist", "due": "2026-10-20T08:00:00+02:00",
+         "notify": "2026-10-20T07:45:00+02:00", "rule": "FREQ=DAILY"}
+
+    "due" may also be an epoch time; entries without "due" are untimed.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+
+from .recurrence import Recurrence
+from .store import Reminder
+
+try:
+    from dateutil.tz import gettz
+except ImportError:  # Python 3.9+ without dateutil
+    from zoneinfo import ZoneInfo
+
+    def gettz(name):
+        try:
+            return ZoneInfo(name)
+        except (KeyError, ValueError):
+            return None
+
+ICAL_COMPONENTS = ('VEVENT', 'VTODO')
+ICAL_DATETIME = '%Y%m%dT%H%M%S'
+ICAL_DATE = '%Y%m%d'
+ICAL_LINE = 75  # octets per line before folding
+
+# iCalendar RRULE parts the recurrence rules can express
+RRULE_PARTS = ('FREQ', 'INTERVAL', 'BYDAY', 'UNTIL', 'WKST')
+
+
+class Item:
+    """ A reminder read from an import file, before normalization.
+
+        Arguments:
+            name:       what to remind about
+            start:      datetime (aware or floating), date or None (untimed)
+            lead:       timedelta between pre notification and start
+            rule:       RRULE string, or a rule string of an export
+            exdates:    datetimes of skipped occurrences
+            invalid:    True if the entry couldn't be read
+    """
+    __slots__ = ('name', 'start', 'lead', 'rule', 'exdates', 'invalid')
+
+    def __init__(self, name, start=None, lead=None, rule=None, exdates=(),
+                 invalid=False):
+        self.name = name
+        self.start = start
+        self.lead = lead
+        self.rule = rule
+        self.exdates = list(exdates)
+        self.invalid = invalid
+
+
+# iCalendar reading
+
+def _unfold(lines):
+    """ Join folded iCalendar lines. """
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def _property(line):
+    """ Split a content line into (name, params dict, value). """
+    head, _, value = line.partition(':')
+    name, *params = head.split(';')
+    return name.upper(), dict(p.partition('=')[::2] for p in params), value
+
+
+def _unescape(text):
+    return (text.replace('\\n', '\n').replace('\\N', '\n')
+            .replace('\\,', ',').replace('\\;', ';').replace('\\\\', '\\'))
+
+
+def _ical_time(value, params):
+    """ Parse a DATE or DATE-TIME value, resolving TZID when known. """
+    value = value.strip()
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        return datetime.strptime(value, ICAL_DATE).date()
+    dt = datetime.strptime(value.rstrip('Z'), ICAL_DATETIME)
+    if value.endswith('Z'):
+        return dt.replace(tzinfo=timezone.utc)
+    if 'TZID' in params:
+        zone = gettz(params['TZID'].strip('"'))
+        if zone is not None:
+            return dt.replace(tzinfo=zone)
+    return dt  # floating time
+
+
+def _duration(value):
+    """ Parse an iCalendar duration like -PT15M or -P1D. """
+    sign = -1 if value.startswith('-') else 1
+    value = value.lstrip('+-').lstrip('P')
+    amounts = {'W': 0, 'D': 0, 'H': 0, 'M': 0, 'S': 0}
+    number = ''
+    for c in value:
+        if c.isdigit():
+            number += c
+        elif c in amounts:
+            amounts[c] = int(number or 0)
+            number = ''
+    return sign * timedelta(weeks=amounts['W'], days=amounts['D'],
+                            hours=amounts['H'], minutes=amounts['M'],
+                            seconds=amounts['S'])
+
+
+def read_ical(lines):
+    """ Yield an Item for each VEVENT and VTODO of an iCalendar stream. """
+    item = None
+    in_alarm = False
+    has_due = False
+    for line in _unfold(lines):
+        name, params, value = _property(line)
+        if name == 'BEGIN' and value.upper() in ICAL_COMPONENTS:
+            item = Item('')
+            has_due = False
+        elif item is None:
+            continue
+        elif name == 'BEGIN' and value.upper() == 'VALARM':
+            in_alarm = True
+        elif name == 'END' and value.upper() == 'VALARM':
+            in_alarm = False
+        elif name == 'END' and value.upper() in ICAL_COMPONENTS:
+            if item.name:
+                yield item
+            item = None
+        elif in_alarm:
+            # Only alarms relative to the start become pre notifications
+            if name == 'TRIGGER' and params.get('RELATED', 'START') == \
+                    'START' and 'VALUE' not in params:
+                lead = -_duration(value)
+                if lead > timedelta(0) and (item.lead is None or
+                                            lead > item.lead):
+                    item.lead = lead
+        elif name == 'SUMMARY':
+            item.name = _unescape(value).strip()
+        elif name == 'RRULE':
+            item.rule = value
+        else:
+            try:
+                if name == 'DTSTART' and not has_due:
+                    item.start = _ical_time(value, params)
+                elif name == 'DUE':  # to-dos are due at DUE, not DTSTART
+                    item.start = _ical_time(value, params)
+                    has_due = True
+                elif name == 'EXDATE':
+                    item.exdates.extend(_ical_time(v, params)
+                                        for v in value.split(','))
+            except ValueError:
+                item.invalid = True
+
+
+def read_jsonl(lines):
+    """ Yield an Item for each JSON Lines entry, skipping blank lines. """
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+            if not isinstance(entry, dict):
+                raise ValueError('Entries must be objects')
+            name = entry['name']
+            rule = entry.get('rule')
+            if not isinstance(name, str):
+                raise ValueError('Names must be strings')
+            if rule is not None and not isinstance(rule, str):
+                raise ValueError('Rules must be strings')
+            start = _json_time(entry.get('due'))
+            notify = _json_time(entry.get('notify'))
+        except (AttributeError, KeyError, OverflowError, OSError, TypeError,
+                ValueError):
+            yield Item('', invalid=True)
+            continue
+        lead = None
+        if start is not None and notify is not None:
+            lead = start - notify
+        yield Item(name, start, lead, rule)
+
+
+def _json_time(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, timezone.utc)
+    return datetime.fromisoformat(value) if hasattr(
+        datetime, 'fromisoformat') else datetime.strptime(
+            value, '%Y-%m-%dT%H:%M:%S%z')
+
+
+# Normalization
+
+def _localize(dt, tz, default_time):
+    """ Aware datetime from a date, floating or aware datetime. """
+    if not isinstance(dt, datetime):  # all day, use the default time
+        dt = datetime.combine(dt, default_time)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=tz)
+    return dt.astimezone(tz)
+
+
+def _recurrence(item, start, tz, default_time):
+    """ Recurrence for the rule of item starting at epoch time start.
+
+        Raises ValueError for rules that can't be expressed.
+    """
+    parts = dict(p.partition('=')[::2] for p in item.rule.split(';') if p)
+    if 'DTSTART' in parts:  # a rule string written by write_jsonl()
+        return Recurrence.parse(item.rule)
+    unsupported = set(parts) - set(RRULE_PARTS)
+    if unsupported:
+        raise ValueError('Unsupported RRULE parts {}'.format(
+            sorted(unsupported)))
+    until = None
+    if parts.get('UNTIL'):
+        until = int(_localize(_ical_time(parts['UNTIL'], {}), tz,
+                              default_time).timestamp())
+    return Recurrence(
+        start, parts['FREQ'], parts.get('INTERVAL', 1),
+        [d for d in parts.get('BYDAY', '').split(',') if d], until,
+        [int(_localize(d, tz, default_time).timestamp())
+         for d in item.exdates])
+
+
+def to_reminders(items, tz, now, default_time, counts):
+    """ Normalize items to (name, reminder) pairs.
+
+        Times are converted to epoch seconds, floating times and dates are
+        read in tz. Past one-off items are dropped, repeating ones start at
+        their next occurrence. Untimed items give (name, None).
+
+        Arguments:
+            items:          iterable of Item
+            tz:             local timezone
+            now:            epoch time
+            default_time:   time of day for items with a date only
+            counts:         Counter updated with 'past' and 'invalid'
+    """
+    for item in items:
+        if item.invalid:
+            counts['invalid'] += 1
+            continue
+        if item.start is None:
+            yield item.name, None
+            continue
+        try:
+            start = _localize(item.start, tz, default_time)
+            due = int(start.timestamp())
+            rule = None
+            if item.rule:
+                rule = _recurrence(item, due, tz, default_time)
+                if due <= now or due in rule.exdates:
+                    due = rule.next_after(now, tz)
+        except (KeyError, ValueError, OverflowError):
+            counts['invalid'] += 1
+            continue
+        if due is None or due <= now:
+            counts['past'] += 1
+            continue
+        lead = int(item.lead.total_seconds()) if item.lead else 0
+        yield item.name, Reminder(item.name, due, due - max(lead, 0),
+                                  rule=str(rule) if rule else None)
+
+
+def unique(batch, reminders, untimed_named, counts):
+    """ Drop the reminders of batch with the name and due time of an
+        existing or an earlier reminder of the batch, and the untimed ones
+        with an existing name.
+
+        Earlier batches are in the index once they are stored, so only the
+        current batch is remembered and memory doesn't grow with the file.
+
+        Arguments:
+            batch:          list of (name, reminder) pairs
+            reminders:      ReminderView or ReminderIndex of the reminders
+            untimed_named:  function returning the untimed reminders named
+                            like a name, see NameIndex.named()
+            counts:         Counter updated with 'duplicates'
+    """
+    seen = set()
+    for name, reminder in batch:
+        lowered = name.lower()
+        if reminder is None:
+            key = lowered
+            exists = any(n.lower() == lowered
+                         for n in untimed_named(name))
+        else:
+            key = (lowered, reminder.due)
+            exists = any(r.name.lower() == lowered for r in
+                         reminders.between(reminder.due, reminder.due + 1))
+        if exists or key in seen:
+            counts['duplicates'] += 1
+            continue
+        seen.add(key)
+        yield name, reminder
+
+
+def batched(iterable, size):
+    """ Yield lists of up to size items. """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Export
+
+def _ical_utc(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime(
+        ICAL_DATETIME) + 'Z'
+
+
+def _ical_local(epoch, tz):
+    return datetime.fromtimestamp(epoch, tz).strftime(ICAL_DATETIME)
+
+
+def _escape(text):
+    return (text.replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+
+def _fold(line):
+    """ Fold a content line to lines of at most 75 octets. """
+    data = line.encode('utf-8')
+    if len(data) <= ICAL_LINE:
+        return line + '\r\n'
+    parts = []
+    while data:
+        size = ICAL_LINE if not parts else ICAL_LINE - 1
+        cut = min(size, len(data))
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1  # don't split UTF-8 sequences
+        parts.append(data[:cut].decode('utf-8'))
+        data = data[cut:]
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def write_ical(reminders, untimed, tz, stamp):
+    """ Yield the lines of an iCalendar file.
+
+        One-off reminders are written in UTC, repeating ones in floating
+        local time so the rule keeps its wall clock time. Repeating
+        reminders are exported with their whole rule, their current due time
+        isn't kept.
+
+        Arguments:
+            reminders:  iterable of Reminder
+            untimed:    iterable of untimed reminder names
+            tz:         local timezone
+            stamp:      epoch time used for DTSTAMP
+    """
+    yield _fold('BEGIN:VCALENDAR')
+    yield _fold('VERSION:2.0')
+    yield _fold('PRODID:-//Mycroft//Reminder Skill//EN')
+    for r in reminders:
+        yield _fold('BEGIN:VEVENT')
+        yield _fold('UID:{}@mycroft-reminder'.format(r.id))
+        yield _fold('DTSTAMP:' + _ical_utc(stamp))
+        yield _fold('SUMMARY:' + _escape(r.name))
+        rule = r.recurrence
+        if rule is None:
+            yield _fold('DTSTART:' + _ical_utc(r.due))
+        else:
+            # DTSTART is the first occurrence in iCalendar
+            first = rule.next_after(rule.start - 1, tz) or r.due
+            yield _fold('DTSTART:' + _ical_local(first, tz))
+            parts = ['FREQ=' + rule.freq]
+            if rule.interval != 1:
+                parts.append('INTERVAL={}'.format(rule.interval))
+            if rule.byday:
+                parts.append('BYDAY=' + ','.join(rule.byday))
+            if rule.until is not None:
+                parts.append('UNTIL=' + _ical_utc(rule.until))
+            yield _fold('RRULE:' + ';'.join(parts))
+            for t in sorted(rule.exdates):
+                yield _fold('EXDATE:' + _ical_local(t, tz))
+        if r.notify < r.due:
+            yield _fold('BEGIN:VALARM')
+            yield _fold('ACTION:DISPLAY')
+            yield _fold('DESCRIPTION:' + _escape(r.name))
+            yield _fold('TRIGGER:-PT{}S'.format(r.due - r.notify))
+            yield _fold('END:VALARM')
+        yield _fold('END:VEVENT')
+    for name in untimed:
+        yield _fold('BEGIN:VTODO')
+        yield _fold('DTSTAMP:' + _ical_utc(stamp))
+        yield _fold('SUMMARY:' + _escape(name))
+        yield _fold('END:VTODO')
+    yield _fold('END:VCALENDAR')
+
+
+def write_jsonl(reminders, untimed, tz):
+    """ Yield one JSON line per reminder, times with their UTC offset. """
+    for r in reminders:
+        entry = {'id': r.id, 'name': r.name,
+                 'due': datetime.fromtimestamp(r.due, tz).isoformat()}
+        if r.notify != r.due:
+            entry['notify'] = datetime.fromtimestamp(r.notify,
+                                                     tz).isoformat()
+        if r.rule:
+            entry['rule'] = r.rule
+        yield json.dumps(entry, ensure_ascii=False) + '\n'
+    for name in untimed:
+        yield json.dumps({'name': name}, ensure_ascii=False) + '\n'
+
+
+READERS = {'ics': read_ical, 'jsonl': read_jsonl}
+
+EXTENSIONS = {'ics': 'ics', 'ical': 'ics', 'ifb': 'ics',
+              'jsonl': 'jsonl', 'ndjson': 'jsonl', 'json': 'jsonl'}
+
+
+def file_format(path):
+    """ 'ics' or 'jsonl' depending on the file extension of path. """
+    extension = path.rsplit('.', 1)[-1].lower()
+    if extension not in EXTENSIONS:
+        raise ValueError('Unknown file format of {}'.format(path))
+    return EXTENSIONS[extension]